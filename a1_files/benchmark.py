@@ -0,0 +1,292 @@
+"""
+Benchmark suite for the Travel Inspiration recommender.
+
+Generates synthetic destination databases of any size, with continents,
+climates, costs and crime levels drawn in proportions like those of
+destinations.csv, and random questionnaire profiles. For each catalog size
+it measures the time to load the database from csv and from a columnar
+catalog file, the peak memory used while loading, the latency of single
+recommendations and the throughput of batch recommendations. The same
+seed always gives the same catalog and profiles.
+
+The results are printed as JSON, and can be saved and later compared to
+a saved baseline:
+
+    python benchmark.py --rows 1000 100000 --save baseline.json
+    python benchmark.py --rows 1000 100000 --baseline baseline.json
+
+Saved results record the machine they were measured on and the tolerance
+to compare them with, which --tolerance overrides. Times are only
+comparable on the same machine, so comparing with a baseline from
+another machine gives a warning. benchmark_baseline.json holds results
+for the default sizes.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from destinations import (CLIMATES, CONTINENTS, COSTS, CRIMES, INTEREST_KEYS,
+                          SEASON_KEYS, Destinations, write_columns)
+from recommender import Profile, recommend_batch, recommend_one
+
+
+# Proportions of destinations.csv, in CONTINENTS, COSTS and CRIMES order
+CONTINENT_WEIGHTS = (6, 7, 9, 12, 11, 4, 1)
+COST_WEIGHTS = (11, 20, 19)
+CRIME_WEIGHTS = (22, 19, 9)
+KID_FRIENDLY = 19 / 50
+
+# Proportions of each climate on each continent, in CLIMATES order. Every
+# pair is possible, but most are rare, as in destinations.csv.
+CLIMATE_WEIGHTS = {
+    'asia': (1, 2, 1, 8, 3),
+    'africa': (1, 1, 4, 2, 8),
+    'north america': (1, 4, 8, 6, 1),
+    'south america': (1, 1, 6, 18, 2),
+    'europe': (2, 2, 2, 16, 1),
+    'oceania': (1, 2, 4, 2, 1),
+    'antarctica': (20, 1, 1, 1, 1),
+}
+
+# Metrics compared with a baseline, and whether a larger value is better
+METRICS = {
+    'load_seconds': False,
+    'cached_load_seconds': False,
+    'columnar_load_seconds': False,
+    'csv_mb': False,
+    'columnar_mb': False,
+    'peak_memory_mb': False,
+    'query_p50_ms': False,
+    'query_p99_ms': False,
+    'batch_profiles_per_second': True,
+}
+
+
+def _choose(rng, weights, size):
+    """(ndarray) Return size codes drawn in proportion to the weights."""
+    weights = np.asarray(weights, dtype=np.float64)
+    return rng.choice(len(weights), size=size, p=weights / weights.sum()).astype(np.int8)
+
+
+def generate_catalog(rows, seed=0):
+    """(dict) Return the columns of a synthetic catalog, see Destinations.get_columns.
+
+    Parameters:
+        rows (int): Number of destinations.
+        seed (int): Seed of the random catalog.
+    """
+    rng = np.random.default_rng(seed)
+    continents = _choose(rng, CONTINENT_WEIGHTS, rows)
+    climates = np.empty(rows, dtype=np.int8)
+    for code, continent in enumerate(CONTINENTS):
+        on_continent = continents == code
+        climates[on_continent] = _choose(rng, CLIMATE_WEIGHTS[continent], on_continent.sum())
+    return {
+        'name': ['Destination {}'.format(row) for row in range(rows)],
+        'labels': {'continent': list(CONTINENTS), 'climate': list(CLIMATES),
+                   'cost': list(COSTS), 'crime': list(CRIMES)},
+        'continent': continents,
+        'climate': climates,
+        'cost': _choose(rng, COST_WEIGHTS, rows),
+        'crime': _choose(rng, CRIME_WEIGHTS, rows),
+        'kids': rng.random(rows) < KID_FRIENDLY,
+        'interests': rng.integers(0, 6, (rows, len(INTEREST_KEYS))).astype(np.int8),
+        'season_factors': np.round(rng.uniform(1.5, 3.5, (rows, len(SEASON_KEYS))), 2),
+    }
+
+
+def write_catalog(filename, rows, seed=0, chunk_size=100000):
+    """Write a synthetic catalog as a destination database.
+
+    Parameters:
+        filename (str): Name of the file to write, in any format
+            destinations.write_columns writes.
+        rows (int): Number of destinations.
+        seed (int): Seed of the random catalog.
+        chunk_size (int): Number of destinations written at a time.
+    """
+    write_columns(filename, generate_catalog(rows, seed), chunk_size)
+
+
+def generate_profiles(count, seed=0):
+    """(list<Profile>) Return random questionnaire profiles.
+
+    Parameters:
+        count (int): Number of profiles.
+        seed (int): Seed of the random profiles.
+    """
+    rng = random.Random(seed)
+    return [Profile(rng.sample(CONTINENTS, rng.randint(1, len(CONTINENTS))),
+                    rng.choice(COSTS), rng.choice(CRIMES), rng.random() < 0.5,
+                    rng.sample(SEASON_KEYS, rng.randint(1, len(SEASON_KEYS))),
+                    rng.choice(CLIMATES),
+                    [rng.randint(-5, 5) for _ in INTEREST_KEYS])
+            for _ in range(count)]
+
+
+def _percentile(ordered, fraction):
+    """(float) Return the value below which the fraction of the sorted values fall."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(rows, seed=0, queries=1000, batch=1000):
+    """(dict) Measure one catalog size.
+
+    Parameters:
+        rows (int): Number of destinations in the catalog.
+        seed (int): Seed of the catalog and profiles.
+        queries (int): Number of single recommendations timed.
+        batch (int): Number of profiles in the batch.
+    """
+    directory = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(directory, 'destinations.csv')
+        write_catalog(filename, rows, seed)
+        columnar = os.path.join(directory, 'destinations.tcat')
+        write_catalog(columnar, rows, seed)
+        csv_bytes = os.path.getsize(filename)
+        columnar_bytes = os.path.getsize(columnar)
+
+        start = time.perf_counter()
+        Destinations(filename)
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        Destinations(columnar)
+        columnar_load_seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        Destinations(filename)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        # The first load with the cache writes it, the second reads it
+        Destinations(filename, cache=True)
+        start = time.perf_counter()
+        destinations = Destinations(filename, cache=True)
+        cached_load_seconds = time.perf_counter() - start
+        destinations.get_index()
+
+        latencies = []
+        for profile in generate_profiles(queries, seed):
+            start = time.perf_counter()
+            recommend_one(destinations, profile)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+
+        profiles = generate_profiles(batch, seed + 1)
+        start = time.perf_counter()
+        recommend_batch(destinations, profiles)
+        batch_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory)
+
+    return {
+        'rows': rows,
+        'csv_mb': csv_bytes / 2 ** 20,
+        'columnar_mb': columnar_bytes / 2 ** 20,
+        'load_seconds': load_seconds,
+        'cached_load_seconds': cached_load_seconds,
+        'columnar_load_seconds': columnar_load_seconds,
+        'peak_memory_mb': peak / 2 ** 20,
+        'query_p50_ms': _percentile(latencies, 0.50) * 1000,
+        'query_p99_ms': _percentile(latencies, 0.99) * 1000,
+        'batch_profiles_per_second': batch / batch_seconds,
+    }
+
+
+# Fraction a metric may worsen by before it is reported, unless the
+# baseline or --tolerance gives another
+TOLERANCE = 0.2
+
+
+def machine():
+    """(dict) Return a description of this machine and its Python and NumPy."""
+    return {
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpus': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """(list<str>) Return a description of each metric worse than the baseline by
+    more than the tolerance.
+
+    Parameters:
+        results (list<dict>): Results of run, one for each catalog size.
+        baseline (list<dict>): Earlier results to compare with.
+        tolerance (float): Fraction a metric may worsen by, e.g. 0.2.
+    """
+    earlier = {result['rows']: result for result in baseline}
+    regressions = []
+    for result in results:
+        before = earlier.get(result['rows'])
+        if before is None:
+            continue
+        for metric, larger_is_better in METRICS.items():
+            if metric not in before or metric not in result or before[metric] <= 0:
+                continue
+            ratio = result[metric] / before[metric]
+            if (ratio < 1 - tolerance) if larger_is_better else (ratio > 1 + tolerance):
+                regressions.append('{} rows: {} {:.4g} against {:.4g} in the baseline'.format(
+                    result['rows'], metric, result[metric], before[metric]))
+    return regressions
+
+
+def main():
+    """Measure the catalog sizes given on the command line and compare them with a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the Travel Inspiration recommender.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help="catalog sizes to measure (default: 1000 10000 100000)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--queries', type=int, default=1000,
+                        help="single recommendations timed for each size")
+    parser.add_argument('--batch', type=int, default=1000,
+                        help="profiles in the batch for each size, scored against every destination")
+    parser.add_argument('--save', metavar='FILE', help="write the results to FILE")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="compare the results with those saved in FILE")
+    parser.add_argument('--tolerance', type=float,
+                        help="fraction a metric may worsen by before it is reported "
+                             "(default: the baseline's, or {})".format(TOLERANCE))
+    options = parser.parse_args()
+
+    results = [run(rows, options.seed, options.queries, options.batch) for rows in options.rows]
+    tolerance = TOLERANCE if options.tolerance is None else options.tolerance
+    report = {'seed': options.seed, 'queries': options.queries, 'batch': options.batch,
+              'machine': machine(), 'tolerance': tolerance, 'results': results}
+    print(json.dumps(report, indent=2))
+    if options.save:
+        with open(options.save, 'w') as save_file:
+            json.dump(report, save_file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('machine') != report['machine']:
+            print('The baseline was measured on another machine, {}, so its times may not be '
+                  'comparable'.format(json.dumps(baseline.get('machine'))), file=sys.stderr)
+        tolerance = baseline.get('tolerance', TOLERANCE) if options.tolerance is None \
+            else options.tolerance
+        regressions = compare(results, baseline['results'], tolerance)
+        for regression in regressions:
+            print('Worse than the baseline: ' + regression, file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compiled on-disk cache of a parsed destination database.
+
+The columns of a parsed catalog are saved as .npy files in a directory
+next to the csv file, so that the next load memory-maps them instead of
+parsing the csv again. The cache is ignored once the csv file's size or
+modification time no longer match the ones it was built from.
+"""
+
+import json
+import os
+
+import numpy as np
+
+
+CACHE_VERSION = 1
+ARRAY_COLUMNS = ('continent', 'climate', 'cost', 'crime', 'kids',
+                 'interests', 'season_factors')
+META_FILE = 'meta.json'
+
+
+def cache_path(filename):
+    """(str) Return the cache directory of a destination database.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+    """
+    return filename + '.cache'
+
+
+def _stamp(filename):
+    """(dict) Return the size and modification time of a file."""
+    status = os.stat(filename)
+    return {'size': status.st_size, 'mtime_ns': status.st_mtime_ns}
+
+
+def load(filename):
+    """(dict | None) Return the cached columns of a destination database.
+
+    The arrays are read-only memory maps of the cache files.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+
+    Return:
+        (dict | None): Columns as taken by Destinations.from_columns,
+            or None if there is no up to date cache.
+    """
+    directory = cache_path(filename)
+    try:
+        with open(os.path.join(directory, META_FILE)) as meta_file:
+            meta = json.load(meta_file)
+        if meta.get('version') != CACHE_VERSION or meta.get('source') != _stamp(filename):
+            return None
+        columns = {column: np.load(os.path.join(directory, column + '.npy'), mmap_mode='r')
+                   for column in ARRAY_COLUMNS}
+        names = np.load(os.path.join(directory, 'name.npy'))
+    except (OSError, ValueError):
+        return None
+
+    columns['name'] = names.tolist()
+    columns['labels'] = meta['labels']
+    return columns
+
+
+def save(filename, columns):
+    """Write the parsed columns of a destination database to its cache.
+
+    The metadata is written last, so an interrupted save leaves a cache
+    that load ignores.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+        columns (dict): Columns as returned by Destinations.get_columns.
+    """
+    directory = cache_path(filename)
+    meta_path = os.path.join(directory, META_FILE)
+    os.makedirs(directory, exist_ok=True)
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    for column in ARRAY_COLUMNS:
+        np.save(os.path.join(directory, column + '.npy'), np.asarray(columns[column]))
+    np.save(os.path.join(directory, 'name.npy'), np.array(columns['name'], dtype=str))
+
+    meta = {
+        'version': CACHE_VERSION,
+        'source': _stamp(filename),
+        'labels': columns['labels'],
+    }
+    temporary = meta_path + '.tmp'
+    with open(temporary, 'w') as meta_file:
+        json.dump(meta, meta_file)
+    os.replace(temporary, meta_path)
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the catalog cache for Travel Inspiration",
+          "and is not meant to be executed on its own.")
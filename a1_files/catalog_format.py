@@ -0,0 +1,225 @@
+"""
+Compressed and columnar destination database files.
+
+Database files ending in ".gz" or ".xz" are compressed with gzip or xz,
+and are decompressed as they are read or written rather than to disk.
+
+Files ending in ".tcat", or ".tcat.gz" / ".tcat.xz", hold a catalog in a
+columnar binary format: a JSON header describing each column, followed
+by the column data in header order. Each column is stored in the
+smallest encoding that gives back its exact values:
+
+    dictionary  categorical codes as int8, with the labels in the header
+    bits        a bool column, eight rows to the byte
+    plain       an array as it is, such as the int8 interest scores
+    float32     decimal values, rounded back to the header's number of
+                decimal places when read, such as the season factors
+    utf8        strings, as UTF-8 bytes after their uint32 offsets
+
+The file is read one column at a time from the start, so a compressed
+file is never decompressed whole.
+"""
+
+import gzip
+import json
+import lzma
+import struct
+
+import numpy as np
+
+from names import NameTable
+
+
+# Compressed files are opened with the module of their suffix
+COMPRESSIONS = {'.gz': gzip, '.xz': lzma}
+
+COLUMNAR_SUFFIX = '.tcat'
+MAGIC = b'TRAVCAT\n'
+FORMAT_VERSION = 1
+
+# Categorical columns, stored with the dictionary encoding
+CATEGORICAL_COLUMNS = ('continent', 'climate', 'cost', 'crime')
+
+# Most decimal places tried for the float32 encoding
+MAX_DECIMALS = 6
+
+
+def _compression(filename):
+    """(module | None) Return the module compressing the file, or None if it is not compressed."""
+    for suffix, module in COMPRESSIONS.items():
+        if filename.endswith(suffix):
+            return module
+    return None
+
+
+def open_file(filename, mode='r'):
+    """(file) Open a file, decompressing or compressing it as it is read or written.
+
+    Text files are opened with newline='', as the csv module expects.
+
+    Parameters:
+        filename (str): Name of the file, compressed if it ends in a suffix of COMPRESSIONS.
+        mode (str): 'r', 'w', 'rb' or 'wb'.
+    """
+    module = _compression(filename)
+    if 'b' in mode:
+        return open(filename, mode) if module is None else module.open(filename, mode)
+    if module is None:
+        return open(filename, mode, newline='')
+    return module.open(filename, mode + 't', newline='')
+
+
+def is_columnar(filename):
+    """(bool) Return if the file holds a catalog in the columnar format.
+
+    Parameters:
+        filename (str): Name of the file.
+    """
+    for suffix in COMPRESSIONS:
+        if filename.endswith(suffix):
+            filename = filename[:-len(suffix)]
+    return filename.endswith(COLUMNAR_SUFFIX)
+
+
+def _float32_decimals(values):
+    """(int | None) Return the fewest decimal places that give back every value
+    after storing it as float32, or None if there are none.
+    """
+    single = values.astype('<f4')
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(single.astype(np.float64), decimals), values):
+            return decimals
+    return None
+
+
+def _encode_columns(columns):
+    """(tuple<list, list>) Return the header entry and the arrays stored for each column."""
+    rows = len(columns['name'])
+    entries = []
+    arrays = []
+
+    names = columns['name']
+    if isinstance(names, NameTable):
+        names = list(names)
+    data, offsets = NameTable.encode(names)
+    if len(data) < 2 ** 32:
+        offsets = offsets.astype('<u4')
+    entries.append({'name': 'name', 'encoding': 'utf8', 'offsets': offsets.dtype.str,
+                    'nbytes': len(data)})
+    arrays.extend([offsets, data])
+
+    for column in CATEGORICAL_COLUMNS:
+        entries.append({'name': column, 'encoding': 'dictionary',
+                        'labels': list(columns['labels'][column])})
+        arrays.append(np.asarray(columns[column], dtype=np.int8))
+
+    entries.append({'name': 'kids', 'encoding': 'bits'})
+    arrays.append(np.packbits(np.asarray(columns['kids'], dtype=bool)))
+
+    interests = np.asarray(columns['interests'])
+    entries.append({'name': 'interests', 'encoding': 'plain', 'dtype': interests.dtype.str,
+                    'shape': interests.shape[1:]})
+    arrays.append(interests)
+
+    factors = np.asarray(columns['season_factors'], dtype=np.float64)
+    decimals = _float32_decimals(factors) if rows else 0
+    if decimals is None:
+        entries.append({'name': 'season_factors', 'encoding': 'plain', 'dtype': '<f8',
+                        'shape': factors.shape[1:]})
+        arrays.append(factors.astype('<f8'))
+    else:
+        entries.append({'name': 'season_factors', 'encoding': 'float32', 'decimals': decimals,
+                        'shape': factors.shape[1:]})
+        arrays.append(factors.astype('<f4'))
+    return entries, arrays
+
+
+def write(filename, columns):
+    """Write catalog columns to a file in the columnar format.
+
+    Parameters:
+        filename (str): Name of the file, compressed if it ends in a suffix of COMPRESSIONS.
+        columns (dict): Columns as returned by Destinations.get_columns.
+    """
+    entries, arrays = _encode_columns(columns)
+    header = json.dumps({'version': FORMAT_VERSION, 'rows': len(columns['name']),
+                         'columns': entries}).encode('utf-8')
+    with open_file(filename, 'wb') as catalog_file:
+        catalog_file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for array in arrays:
+            catalog_file.write(np.ascontiguousarray(array).data)
+
+
+def _read_exact(catalog_file, nbytes):
+    """(bytearray) Read exactly nbytes from a file.
+
+    Raises:
+        ValueError: If the file ends first.
+    """
+    data = bytearray(nbytes)
+    view = memoryview(data)
+    position = 0
+    while position < nbytes:
+        read = catalog_file.readinto(view[position:])
+        if not read:
+            raise ValueError("The catalog file is truncated")
+        position += read
+    return data
+
+
+def _read_array(catalog_file, dtype, shape):
+    """(ndarray) Read the next array of the file, converted to this machine's byte order."""
+    dtype = np.dtype(dtype)
+    count = int(np.prod(shape))
+    array = np.frombuffer(_read_exact(catalog_file, count * dtype.itemsize), dtype=dtype)
+    return array.reshape(shape).astype(dtype.newbyteorder('='), copy=False)
+
+
+def read(filename):
+    """(dict) Read a catalog file in the columnar format.
+
+    Parameters:
+        filename (str): Name of the file, compressed if it ends in a suffix of COMPRESSIONS.
+
+    Return:
+        (dict): Columns as taken by Destinations.from_columns.
+
+    Raises:
+        ValueError: If the file is not a catalog in a supported version of the format.
+    """
+    with open_file(filename, 'rb') as catalog_file:
+        if bytes(_read_exact(catalog_file, len(MAGIC))) != MAGIC:
+            raise ValueError("{} is not a columnar catalog file".format(filename))
+        length, = struct.unpack('<I', _read_exact(catalog_file, 4))
+        header = json.loads(_read_exact(catalog_file, length).decode('utf-8'))
+        if header.get('version') != FORMAT_VERSION:
+            raise ValueError("Unsupported catalog format version {}".format(header.get('version')))
+
+        rows = header['rows']
+        columns = {'labels': {}}
+        for entry in header['columns']:
+            name, encoding = entry['name'], entry['encoding']
+            if encoding == 'utf8':
+                offsets = _read_array(catalog_file, entry['offsets'], (rows + 1,))
+                data = _read_array(catalog_file, np.uint8, (entry['nbytes'],))
+                columns[name] = NameTable(data, offsets.astype(np.int64))
+            elif encoding == 'dictionary':
+                columns['labels'][name] = entry['labels']
+                columns[name] = _read_array(catalog_file, np.int8, (rows,))
+            elif encoding == 'bits':
+                packed = _read_array(catalog_file, np.uint8, (-(-rows // 8),))
+                columns[name] = np.unpackbits(packed, count=rows).astype(bool)
+            elif encoding == 'plain':
+                columns[name] = _read_array(catalog_file, entry['dtype'], [rows] + entry['shape'])
+            elif encoding == 'float32':
+                single = _read_array(catalog_file, '<f4', [rows] + entry['shape'])
+                columns[name] = np.round(single.astype(np.float64), entry['decimals'])
+            else:
+                raise ValueError("Unknown column encoding {!r} of {}".format(encoding, name))
+    return columns
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the catalog file formats for Travel Inspiration",
+          "and is not meant to be executed on its own.")
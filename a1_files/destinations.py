@@ -1,8 +1,10 @@
 """
 Support file for Travel Inspiration (Assignment 1) in CSSE1001/7030.
 
-Reads the destination data from the database csv file.
-Stores the data in a list of destination objects.
+Reads the destination data from the database csv file, which may be
+compressed, or from a columnar catalog file, see catalog_format.
+Stores the data column by column in NumPy arrays so that the whole
+catalog can be scored at once.
 Provides a mechanism to access all of the destinations and
 to extract the data for each destination in turn.
 """
@@ -13,19 +15,82 @@ __copyright__ = "The University of Queensland, 2019"
 
 
 import csv
+import glob
+import os
+import sys
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import compress, count, islice
+
+import numpy as np
+
+import catalog_cache
+import catalog_format
+from indexes import BucketBounds, ConstraintIndex
+from names import NameMatcher, NameTable
+from profiling import timed
+
+
+# Column order of the interest scores and season factors in the matrices.
+INTEREST_KEYS = ('wildlife', 'sports', 'adventure', 'cuisine', 'nature',
+                 'historical', 'beach')
+SEASON_KEYS = ('spring', 'summer', 'autumn', 'winter')
+_INTEREST_COLUMNS = {key: column for column, key in enumerate(INTEREST_KEYS)}
+_SEASON_COLUMNS = {key: column for column, key in enumerate(SEASON_KEYS)}
+# First SEASON_KEYS column in each season_mask
+_FIRST_SEASON = [0] + [(mask & -mask).bit_length() - 1 for mask in range(1, 1 << len(SEASON_KEYS))]
+
+# Known values of the categorical columns, in the order of their codes.
+# Cost and crime are ordered from cheapest / safest to most expensive / least safe.
+CONTINENTS = ('asia', 'africa', 'north america', 'south america', 'europe',
+              'oceania', 'antarctica')
+CLIMATES = ('cold', 'cool', 'moderate', 'warm', 'hot')
+COSTS = ('$', '$$', '$$$')
+CRIMES = ('low', 'average', 'high')
+
+# apply_delta compacts the catalog once more than one in COMPACT_FRACTION
+# of its rows hold removed destinations
+COMPACT_FRACTION = 4
+
+# Catalog attribute holding each array column
+_COLUMN_ATTRIBUTES = (('continent', '_continents'), ('climate', '_climates'), ('cost', '_costs'),
+                      ('crime', '_crimes'), ('kids', '_kids'), ('interests', '_interests'),
+                      ('season_factors', '_season_factors'))
+
+# Column order of the database csv file
+CSV_FIELDS = ('name', 'cost', 'crime', 'kids', 'climate', 'continent') + SEASON_KEYS + INTEREST_KEYS
 
 
 class Destination:
-    """Representation of a single destination."""
+    """Representation of a single destination.
+
+    Uses __slots__ and stores the interest scores and season factors as
+    tuples in INTEREST_KEYS and SEASON_KEYS order, which keeps each
+    destination small when many are held at once.
+    """
+    __slots__ = ('_name', '_climate', '_continent', '_cost', '_crime',
+                 '_interest_scores', '_kid_friendly', '_season_factors')
+
     def __init__(self, name, continent, climate, cost, crime, kid_friendly, interest_scores, season_factors):
+        """
+        Parameters:
+            interest_scores (dict<str, int> | tuple<int>): Score for each interest,
+                keyed by name or in INTEREST_KEYS order.
+            season_factors (dict<str, float> | tuple<float>): Factor for each season,
+                keyed by name or in SEASON_KEYS order.
+        """
+        if isinstance(interest_scores, dict):
+            interest_scores = [interest_scores[key] for key in INTEREST_KEYS]
+        if isinstance(season_factors, dict):
+            season_factors = [season_factors[key] for key in SEASON_KEYS]
         self._name = name
-        self._climate = climate
-        self._continent = continent
-        self._cost = cost
-        self._crime = crime
-        self._interest_scores = interest_scores
+        self._climate = sys.intern(climate)
+        self._continent = sys.intern(continent)
+        self._cost = sys.intern(cost)
+        self._crime = sys.intern(crime)
+        self._interest_scores = tuple(interest_scores)
         self._kid_friendly = kid_friendly
-        self._season_factors = season_factors
+        self._season_factors = tuple(season_factors)
 
     def get_name(self):
         """(str) Return this destination's name."""
@@ -57,7 +122,7 @@ class Destination:
         Parameter:
             interest (str): Name of the interest to look up its score.
         """
-        return self._interest_scores[interest]
+        return self._interest_scores[_INTEREST_COLUMNS[interest]]
 
     def get_season_factor(self, season):
         """(float) Return this destination's score for the season.
@@ -65,49 +130,875 @@ class Destination:
         Parameter:
             season (str): Name of the season to look up its weight factor.
         """
-        return self._season_factors[season]
+        return self._season_factors[_SEASON_COLUMNS[season]]
+
+
+class _DestinationView(Sequence):
+    """Read-only list of Destination objects built on demand from the columns."""
+    def __init__(self, destinations):
+        self._destinations = destinations
+
+    def __len__(self):
+        return len(self._destinations)
+
+    def __getitem__(self, index):
+        # Rows are only numbered in catalog order once removed rows are gone
+        self._destinations.compact()
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("destination index out of range")
+        return self._destinations.get_destination(index)
+
+
+# Source of catalog versions, unique across all catalogs in the process
+_versions = count(1)
+
+
+def _reserve(buffers, key, column, extra):
+    """(ndarray) Return a writable array starting with the rows of the column,
+    with room for extra rows after them.
+
+    Spare rows are kept in buffers[key], so that a run of small appends
+    copies the column only once in a while. The column must be the start
+    of buffers[key] whenever that is set. Only arrays in buffers are
+    written in place; any other column may be shared, so it is copied.
+
+    Parameters:
+        buffers (dict<str, ndarray>): Arrays with spare rows, by key.
+        key (str): Key of the column in buffers.
+        column (ndarray): The column to add to or change.
+        extra (int): Number of rows to be added.
+    """
+    size = len(column)
+    buffer = buffers.get(key)
+    if buffer is not None and len(buffer) >= size + extra:
+        return buffer
+    buffer = np.empty((size + extra + (size + extra) // 8,) + column.shape[1:], dtype=column.dtype)
+    buffer[:size] = column
+    buffers[key] = buffer
+    return buffer
+
+
+def _encode(value, labels):
+    """(int) Return the code of value in labels, adding it if it is unseen.
+
+    Parameters:
+        value (str): Categorical value read from the database.
+        labels (list<str>): Labels of the column, indexed by code.
+    """
+    try:
+        return labels.index(value)
+    except ValueError:
+        labels.append(value)
+        return len(labels) - 1
+
+
+def encode_rows(rows, labels):
+    """(dict) Encode database rows into catalog columns, see Destinations.get_columns.
+
+    Parameters:
+        rows (iter<dict<str, str>>): Rows keyed by the csv column names.
+        labels (dict<str, list<str>>): Labels of each categorical column,
+            keyed by column name. Labels not seen before are added to them.
+    """
+    names = []
+    continents = []
+    climates = []
+    costs = []
+    crimes = []
+    kids = []
+    interests = []
+    seasons = []
+
+    for row in rows:
+        names.append(row['name'])
+        continents.append(_encode(row['continent'], labels['continent']))
+        climates.append(_encode(row['climate'], labels['climate']))
+        costs.append(_encode(row['cost'], labels['cost']))
+        crimes.append(_encode(row['crime'], labels['crime']))
+        kids.append(row['kids'] == 'True')
+        interests.append([int(row[key]) for key in INTEREST_KEYS])
+        seasons.append([float(row[key]) for key in SEASON_KEYS])
+
+    return {
+        'name': names,
+        'labels': labels,
+        'continent': np.array(continents, dtype=np.int8),
+        'climate': np.array(climates, dtype=np.int8),
+        'cost': np.array(costs, dtype=np.int8),
+        'crime': np.array(crimes, dtype=np.int8),
+        'kids': np.array(kids, dtype=bool),
+        'interests': np.array(interests, dtype=np.int8).reshape(-1, len(INTEREST_KEYS)),
+        'season_factors': np.array(seasons, dtype=np.float64).reshape(-1, len(SEASON_KEYS)),
+    }
+
+
+def _new_labels():
+    """(dict<str, list<str>>) Return the known labels of each categorical column."""
+    return {
+        'continent': list(CONTINENTS),
+        'climate': list(CLIMATES),
+        'cost': list(COSTS),
+        'crime': list(CRIMES),
+    }
+
+
+def read_columns(filename):
+    """(dict) Read a database file into catalog columns, see Destinations.get_columns.
+
+    Parameters:
+        filename (str): Name of file containing destination data, a csv file,
+            compressed if it ends in ".gz" or ".xz", or a columnar catalog file.
+    """
+    if catalog_format.is_columnar(filename):
+        return catalog_format.read(filename)
+    with catalog_format.open_file(filename) as destination_file:
+        return encode_rows(csv.DictReader(destination_file), _new_labels())
+
+
+def write_columns(filename, columns, chunk_size=100000):
+    """Write catalog columns to a database file.
+
+    Parameters:
+        filename (str): Name of the file, in the format read_columns reads from its name.
+        columns (dict): Columns as returned by Destinations.get_columns.
+        chunk_size (int): Number of destinations turned into csv rows at a time.
+    """
+    if catalog_format.is_columnar(filename):
+        catalog_format.write(filename, columns)
+        return
+
+    names = columns['name']
+    with catalog_format.open_file(filename, 'w') as destination_file:
+        writer = csv.writer(destination_file)
+        writer.writerow(CSV_FIELDS)
+        for start in range(0, len(names), chunk_size):
+            stop = min(start + chunk_size, len(names))
+            labels = {column: np.array(columns['labels'][column], dtype=object)[columns[column][start:stop]]
+                      for column in ('continent', 'climate', 'cost', 'crime')}
+            kids = np.where(columns['kids'][start:stop], 'True', 'False')
+            factors = columns['season_factors'][start:stop].tolist()
+            interests = columns['interests'][start:stop].tolist()
+            writer.writerows(
+                [names[start + row], labels['cost'][row], labels['crime'][row],
+                 kids[row], labels['climate'][row], labels['continent'][row]]
+                + factors[row] + interests[row]
+                for row in range(stop - start))
+
+
+def merge_columns(shards):
+    """(dict) Join catalog columns into one, keeping the first destination of each name.
+
+    Shards may have met unknown labels in a different order, so their
+    codes are translated to the labels of the joined catalog.
+
+    Parameters:
+        shards (list<dict>): Catalog columns, see Destinations.get_columns.
+    """
+    labels = _new_labels()
+    merged = {'name': [], 'labels': labels}
+    for column in ('continent', 'climate', 'cost', 'crime'):
+        merged[column] = np.concatenate(
+            [np.array([_encode(label, labels[column]) for label in shard['labels'][column]],
+                      dtype=np.int8)[shard[column]] if len(shard[column]) else shard[column]
+             for shard in shards] or [np.empty(0, dtype=np.int8)])
+    for column, shape, dtype in (('kids', (), bool),
+                                 ('interests', (len(INTEREST_KEYS),), np.int8),
+                                 ('season_factors', (len(SEASON_KEYS),), np.float64)):
+        merged[column] = np.concatenate([shard[column] for shard in shards]
+                                        or [np.empty((0,) + shape, dtype=dtype)])
+    for shard in shards:
+        merged['name'].extend(shard['name'])
+
+    # Rows of the first destination with each name, in catalog order
+    first = {}
+    for row, name in enumerate(merged['name']):
+        first.setdefault(name, row)
+    if len(first) < len(merged['name']):
+        keep = np.fromiter(first.values(), dtype=np.int64, count=len(first))
+        merged['name'] = list(first)
+        for column in merged:
+            if column not in ('name', 'labels'):
+                merged[column] = merged[column][keep]
+    return merged
 
 
 class Destinations:
     """Loads destination data from the database and
        provides access to all the destinations.
     """
-    def __init__(self, filename='destinations.csv'):
+    def __init__(self, filename='destinations.csv', cache=False):
         """Loads the destination data from the database.
 
         Parameters:
-            filename (str): Name of file containing destination data.
+            filename (str): Name of file containing destination data, in any
+                format read_columns reads.
+            cache (bool): If True, load the compiled cache next to the file
+                when it is up to date, and otherwise rebuild it.
+        """
+        self._filename = filename
+        self._cache = cache
+        self.reload()
+
+    @timed('load')
+    def reload(self):
+        """Read the database file again, replacing the whole catalog."""
+        if self._filename is None:
+            raise ValueError("This catalog was not loaded from a file")
+
+        if self._cache:
+            columns = catalog_cache.load(self._filename)
+            if columns is not None:
+                self._set_columns(columns)
+                return
+
+        self._set_columns(read_columns(self._filename))
+
+        if self._cache:
+            try:
+                catalog_cache.save(self._filename, self.get_columns())
+            except OSError:
+                # The cache only saves time, so carry on without it
+                pass
+
+    @classmethod
+    @timed('load')
+    def from_rows(cls, rows):
+        """(Destinations) Build a catalog from rows already read from a database.
+
+        Parameters:
+            rows (iter<dict<str, str>>): Rows keyed by the csv column names.
         """
-        self._destinations = []
+        destinations = cls.__new__(cls)
+        destinations._filename = None
+        destinations._cache = False
+        destinations._load_rows(rows)
+        return destinations
+
+    @classmethod
+    def iter_file(cls, filename='destinations.csv', chunk_size=65536):
+        """Read the database lazily, one catalog of at most chunk_size rows at a time.
 
-        score_keys = [
-            'wildlife',
-            'sports',
-            'adventure',
-            'cuisine',
-            'nature',
-            'historical',
-            'beach'
-        ]
+        Only one chunk of a csv file is held in memory at once, so a catalog
+        too large to load can still be scanned from start to end. A columnar
+        catalog file is read whole, then split into chunks.
 
-        season_keys = ['spring', 'summer', 'autumn', 'winter']
+        Parameters:
+            filename (str): Name of file containing destination data, in any
+                format read_columns reads.
+            chunk_size (int): Largest number of destinations in each chunk.
 
-        with open(filename) as destination_file:
+        Yield:
+            (Destinations): The next chunk of destinations, in file order.
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1, got {}".format(chunk_size))
+        if catalog_format.is_columnar(filename):
+            catalog = cls.from_columns(catalog_format.read(filename))
+            for start in range(0, len(catalog), chunk_size):
+                yield catalog.take(np.arange(start, min(start + chunk_size, len(catalog))))
+            return
+        with catalog_format.open_file(filename) as destination_file:
             reader = csv.DictReader(destination_file)
+            while True:
+                chunk = cls.from_rows(islice(reader, chunk_size))
+                if len(chunk) == 0:
+                    return
+                yield chunk
+
+    @classmethod
+    def from_columns(cls, columns):
+        """(Destinations) Build a catalog from columns such as those of get_columns.
+
+        Parameters:
+            columns (dict): The catalog columns, see get_columns.
+        """
+        destinations = cls.__new__(cls)
+        destinations._filename = None
+        destinations._cache = False
+        destinations._set_columns(columns)
+        return destinations
+
+    @classmethod
+    @timed('load')
+    def from_files(cls, filenames, workers=None):
+        """(Destinations) Load a catalog split over several database files.
 
-            for row in reader:
-                interest_scores = {key: int(row[key]) for key in score_keys}
-                season_factors = {key: float(row[key]) for key in season_keys}
+        The files are read in parallel, one per worker process, and joined
+        in order. Where several destinations have the same name, only the
+        first is kept. An empty list of files gives an empty catalog.
 
-                self._destinations.append(
-                    Destination(row['name'], row['continent'], row['climate'],
-                                row['cost'], row['crime'],
-                                True if row['kids'] == 'True' else False,
-                                interest_scores, season_factors))
+        Parameters:
+            filenames (str | list<str>): Names of the files, or glob patterns
+                such as "regions/*.csv" whose matches are taken in sorted order.
+            workers (int): Largest number of worker processes, by default
+                the number of CPUs. With one worker, or a single file, the
+                files are read in this process.
+
+        Raises:
+            FileNotFoundError: If a name or pattern matches no file.
+        """
+        if isinstance(filenames, str):
+            filenames = [filenames]
+        files = []
+        for pattern in filenames:
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                raise FileNotFoundError("No destination files match " + pattern)
+            files.extend(matches)
+
+        workers = min(workers or os.cpu_count() or 1, len(files))
+        if workers <= 1:
+            shards = [read_columns(filename) for filename in files]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                shards = list(executor.map(read_columns, files))
+        return cls.from_columns(merge_columns(shards))
+
+    def _load_rows(self, rows):
+        """Encode the database rows into the catalog columns.
+
+        Parameters:
+            rows (iter<dict<str, str>>): Rows keyed by the csv column names.
+        """
+        self._set_columns(encode_rows(rows, _new_labels()))
+
+    def _set_columns(self, columns):
+        """Replace the catalog with the given columns, see get_columns."""
+        labels = columns['labels']
+        # A NameTable is read-only, so it is kept as it is instead of copied
+        names = columns['name']
+        self._names = names if isinstance(names, NameTable) else list(names)
+        self._continent_labels = list(labels['continent'])
+        self._climate_labels = list(labels['climate'])
+        self._cost_labels = list(labels['cost'])
+        self._crime_labels = list(labels['crime'])
+        for key, attribute in _COLUMN_ATTRIBUTES:
+            setattr(self, attribute, columns[key])
+        # Rows of removed destinations, kept until the catalog is compacted
+        self._removed = None
+        self._removed_count = 0
+        self._buffers = {}
+        self._index = None
+        self._name_rows = None
+        self._bounds = None
+        self._name_matcher = None
+        self._version = next(_versions)
+
+    def get_columns(self):
+        """(dict) Return every column of the catalog, compacting it first.
+
+        The keys are 'name' (list<str>), 'labels' (the labels of each
+        categorical column, keyed by column name), the int8 code arrays
+        'continent', 'climate', 'cost' and 'crime', the bool array 'kids',
+        the N x 7 int8 'interests' matrix and the N x 4 float64
+        'season_factors' matrix. Later changes to the catalog do not change
+        the arrays returned.
+        """
+        self.compact()
+        # The arrays may be shared from here on, so apply_delta copies them first
+        self._buffers = {}
+        return self._get_rows()
+
+    def _get_rows(self):
+        """(dict) Return the columns as stored, see get_columns, with the rows
+        of removed destinations that have not been compacted away.
+        """
+        return {
+            'name': self._names,
+            'labels': {
+                'continent': self._continent_labels,
+                'climate': self._climate_labels,
+                'cost': self._cost_labels,
+                'crime': self._crime_labels,
+            },
+            'continent': self._continents,
+            'climate': self._climates,
+            'cost': self._costs,
+            'crime': self._crimes,
+            'kids': self._kids,
+            'interests': self._interests,
+            'season_factors': self._season_factors,
+        }
+
+    def take(self, rows):
+        """(Destinations) Return a new catalog of the given rows, in that order.
+
+        Parameters:
+            rows (ndarray): Rows of the destinations to keep.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = self._get_rows()
+        subset = {key: value[rows] for key, value in columns.items()
+                  if isinstance(value, np.ndarray)}
+        subset['name'] = [self._names[row] for row in rows.tolist()]
+        subset['labels'] = columns['labels']
+        return Destinations.from_columns(subset)
+
+    def save(self, filename):
+        """Write the catalog to a database file.
+
+        Parameters:
+            filename (str): Name of the file. Names ending in ".tcat" are
+                written in the columnar format and others as csv, compressed
+                if the name ends in ".gz" or ".xz".
+        """
+        write_columns(filename, self.get_columns())
+
+    def __len__(self):
+        return len(self._names) - self._removed_count
 
     def get_all(self):
         """Returns all the destinations."""
-        return self._destinations
+        self.compact()
+        return _DestinationView(self)
+
+    def get_removed(self):
+        """(ndarray | None) Return whether each row holds a removed destination,
+        or None if no row does.
+
+        apply_delta marks the rows of removed destinations instead of moving
+        every later row up, until the catalog is compacted. Those rows are
+        left out of the index, find and anything that compacts the catalog
+        first, but are still in the column arrays.
+        """
+        return self._removed
+
+    def compact(self):
+        """Drop the rows of removed destinations, renumbering the rows after them.
+
+        The index and name lookup are renumbered rather than built again.
+        The catalog's version changes if any row moves.
+        """
+        if self._removed is None:
+            return
+        keep = ~self._removed
+        renumber = np.cumsum(keep) - 1
+        for _, attribute in _COLUMN_ATTRIBUTES:
+            setattr(self, attribute, getattr(self, attribute)[keep])
+        self._names = list(compress(self._names, keep.tolist()))
+        if self._name_rows is not None:
+            new_rows = renumber.tolist()
+            self._name_rows = {name: new_rows[row] for name, row in self._name_rows.items()}
+        self._removed = None
+        self._removed_count = 0
+        self._buffers = {}
+        if self._index is not None:
+            self._index.compact(renumber)
+        self._version = next(_versions)
+
+    def get_destination(self, index):
+        """(Destination) Return the destination stored in the given row.
+
+        Parameters:
+            index (int): Row of the destination in the catalog.
+        """
+        return Destination(
+            self._names[index],
+            self._continent_labels[self._continents[index]],
+            self._climate_labels[self._climates[index]],
+            self._cost_labels[self._costs[index]],
+            self._crime_labels[self._crimes[index]],
+            bool(self._kids[index]),
+            self._interests[index].tolist(),
+            self._season_factors[index].tolist())
+
+    def get_names(self):
+        """(list<str>) Return the destination names in catalog order, compacting it first.
+
+        A catalog built from a NameTable, such as one attached to shared
+        memory, returns the read-only NameTable instead of a list.
+        """
+        self.compact()
+        return self._names
+
+    def get_name(self, row):
+        """(str) Return the name of the destination in the row.
+
+        Unlike get_names, does not compact the catalog, so rows from the
+        index or find stay valid.
+
+        Parameters:
+            row (int): Row of the destination in the catalog.
+        """
+        return self._names[row]
+
+    def get_interests(self):
+        """(ndarray) Return the N x 7 interest matrix, columns as in INTEREST_KEYS."""
+        return self._interests
+
+    def get_season_factors(self):
+        """(ndarray) Return the N x 4 season matrix, columns as in SEASON_KEYS."""
+        return self._season_factors
+
+    def get_continents(self):
+        """(ndarray) Return the continent codes, indexing get_labels('continent')."""
+        return self._continents
+
+    def get_climates(self):
+        """(ndarray) Return the climate codes, indexing get_labels('climate')."""
+        return self._climates
+
+    def get_costs(self):
+        """(ndarray) Return the cost codes, indexing get_labels('cost')."""
+        return self._costs
+
+    def get_crimes(self):
+        """(ndarray) Return the crime codes, indexing get_labels('crime')."""
+        return self._crimes
+
+    def get_kids(self):
+        """(ndarray) Return whether each destination is kid friendly."""
+        return self._kids
+
+    def get_labels(self, column):
+        """(list<str>) Return the labels of a categorical column, indexed by code.
+
+        Parameters:
+            column (str): One of 'continent', 'climate', 'cost' or 'crime'.
+        """
+        return {
+            'continent': self._continent_labels,
+            'climate': self._climate_labels,
+            'cost': self._cost_labels,
+            'crime': self._crime_labels,
+        }[column]
+
+    def find(self, name):
+        """(int) Return the row of the first destination with the given name.
+
+        Parameters:
+            name (str): Name of the destination.
+
+        Raises:
+            KeyError: If no destination has the name.
+        """
+        if self._name_rows is None:
+            rows = range(len(self._names) - 1, -1, -1)
+            if self._removed is not None:
+                rows = compress(rows, (~self._removed[::-1]).tolist())
+            # Filled back to front, so the first of any repeated name wins
+            self._name_rows = {self._names[row]: row for row in rows}
+        return self._name_rows[name]
+
+    def get_name_matcher(self):
+        """(NameMatcher) Return a matcher finding the destination names in text,
+        in upper or lower case, building it on first use.
+        """
+        if self._name_matcher is None:
+            self._name_matcher = NameMatcher(self.get_names(), ignore_case=True)
+        return self._name_matcher
+
+    def apply_delta(self, adds=(), updates=(), removes=()):
+        """Change the catalog in place and keep its index up to date.
+
+        Updated destinations are changed where they are and added ones go to
+        the end of the catalog. Removed destinations are only marked as
+        removed, see get_removed, so no other row moves and the time taken
+        depends on the size of the change rather than of the catalog. Once
+        more than one in COMPACT_FRACTION rows are removed, the catalog is
+        compacted. The catalog's version changes, which empties any
+        RecommendationCache built on it.
+
+        Parameters:
+            adds (list<dict<str, str>>): Rows of new destinations, keyed by
+                the csv column names.
+            updates (list<dict<str, str>>): New rows for existing destinations,
+                found by their name. Where a destination is updated more
+                than once, the last update is kept.
+            removes (list<str>): Names of the destinations to remove.
+
+        Raises:
+            KeyError: If a destination to update or remove is not in the catalog.
+            ValueError: If a destination to add is already in the catalog, or
+                is added more than once.
+        """
+        updates = list({row['name']: row for row in updates}.values())
+        seen = set()
+        for row in adds:
+            if row['name'] in seen:
+                raise ValueError("Destination {} is added more than once".format(row['name']))
+            seen.add(row['name'])
+
+        labels = {column: list(self.get_labels(column))
+                  for column in ('continent', 'climate', 'cost', 'crime')}
+        added = encode_rows(adds, labels)
+        changed = encode_rows(updates, labels)
+
+        removed = np.array(sorted({self.find(name) for name in removes}), dtype=np.int64)
+        updated = np.array([self.find(name) for name in changed['name']], dtype=np.int64)
+        removes = set(removes)
+        for name in added['name']:
+            try:
+                self.find(name)
+            except KeyError:
+                continue
+            if name not in removes:
+                raise ValueError("Destination {} is already in the catalog".format(name))
+
+        # A destination both updated and removed is only removed
+        keep = ~np.isin(updated, removed)
+        updated = updated[keep]
+        previous = {key: getattr(self, attribute)[updated].copy()
+                    for key, attribute in _COLUMN_ATTRIBUTES if key in labels}
+
+        size = len(self._names)
+        extra = len(added['name'])
+        if len(updated) or extra:
+            for key, attribute in _COLUMN_ATTRIBUTES:
+                column = _reserve(self._buffers, key, getattr(self, attribute), extra)
+                column[updated] = changed[key][keep]
+                column[size:size + extra] = added[key]
+                setattr(self, attribute, column[:size + extra])
+        if extra:
+            if not isinstance(self._names, list):
+                self._names = list(self._names)
+            self._names.extend(added['name'])
+        self._continent_labels = labels['continent']
+        self._climate_labels = labels['climate']
+        self._cost_labels = labels['cost']
+        self._crime_labels = labels['crime']
+
+        # Removed rows stay where they are until the catalog is compacted
+        if len(removed) or (extra and self._removed is not None):
+            if self._removed is None:
+                self._removed = np.zeros(size, dtype=bool)
+            marks = _reserve(self._buffers, 'removed', self._removed, extra)
+            marks[removed] = True
+            marks[size:size + extra] = False
+            self._removed = marks[:size + extra]
+            self._removed_count += len(removed)
+
+        if self._name_rows is not None:
+            if len(self._name_rows) != size - self._removed_count + len(removed):
+                # A removed name may be repeated further on, so look again
+                self._name_rows = None
+            else:
+                for row in removed.tolist():
+                    del self._name_rows[self._names[row]]
+                for row, name in enumerate(added['name'], size):
+                    self._name_rows[name] = row
+
+        if extra or len(removed):
+            self._name_matcher = None
+        if self._index is not None:
+            self._index.apply_delta(removed, updated, previous, size)
+        if self._bounds is not None:
+            # Bounds stay valid without removed rows, so they only widen
+            self._bounds.widen(np.concatenate([updated, np.arange(size, size + extra, dtype=np.int64)]))
+        self._version = next(_versions)
+
+        if self._removed_count * COMPACT_FRACTION > len(self._names):
+            self.compact()
+
+    def get_version(self):
+        """(int) Return a number that changes whenever the catalog's contents or row numbers change."""
+        return self._version
+
+    def get_index(self):
+        """(ConstraintIndex) Return the hard constraint index, building it on first use."""
+        if self._index is None:
+            self._index = ConstraintIndex(self)
+        return self._index
+
+    def get_bounds(self):
+        """(BucketBounds) Return the score bounds of each (continent, climate) bucket,
+        building them on first use.
+        """
+        if self._bounds is None:
+            self._bounds = BucketBounds(self)
+        return self._bounds
+
+    @timed('score')
+    def score_best(self, preferences, seasons, rows=None):
+        """Return each destination's best score over a set of seasons, and its season.
+
+        Only the season each destination scores best in is scored, picked
+        from its season factors by the sign of its interest score. Where a
+        destination scores the same in several of the seasons, the first in
+        SEASON_KEYS order is given.
+
+        Parameters:
+            preferences (dict<str, int> | list<int>): Weight of each interest,
+                either keyed by interest name or in INTEREST_KEYS order.
+            seasons (list<str>): Names of the seasons to choose from.
+            rows (ndarray): Rows to score, by default every destination,
+                after compacting the catalog.
+
+        Return:
+            (tuple<ndarray>): The best score of each destination and the
+                SEASON_KEYS column of the season it is in.
+        """
+        if rows is None:
+            self.compact()
+            rows = np.arange(len(self), dtype=np.int64)
+        interest_scores = self._interests[rows] @ interest_weights(preferences)
+        mask = season_mask(seasons)
+        factors = self._season_factors[rows]
+        largest, smallest = season_extremes(factors, mask)
+        columns = best_season_columns(interest_scores, largest, smallest, mask)
+        return factors[np.arange(len(rows)), columns] * interest_scores, columns
+
+    @timed('score')
+    def score_all(self, preferences, seasons):
+        """(ndarray) Return the score of every destination for every season.
+
+        The score of a destination in a season is its season factor
+        multiplied by the sum of its interest scores weighted by the
+        preferences, the same as travel.main works out one at a time.
+
+        Parameters:
+            preferences (dict<str, int> | list<int>): Weight of each interest,
+                either keyed by interest name or in INTEREST_KEYS order.
+            seasons (list<str>): Names of the seasons to score.
+
+        Return:
+            (ndarray): N x len(seasons) matrix of scores, after compacting the catalog.
+        """
+        self.compact()
+        interest_scores = self._interests @ interest_weights(preferences)
+        columns = [SEASON_KEYS.index(season) for season in seasons]
+        return self._season_factors[:, columns] * interest_scores[:, np.newaxis]
+
+    def skyline(self, preferences, seasons, rows=None):
+        """(ndarray) Return the destinations no other destination beats on cost,
+        crime and score at once.
+
+        A destination is dominated when another is no dearer, no less safe
+        and scores at least as well, and is strictly better in one of the
+        three. Cost and crime are ordered codes with a few levels, so rather
+        than comparing every pair of destinations, the best score at or
+        below each (cost, crime) cell is found with running maximums over
+        the small grid of cells, and each destination is checked against the
+        cells that dominate its own.
+
+        Parameters:
+            preferences (dict<str, int> | list<int>): Weight of each interest,
+                either keyed by interest name or in INTEREST_KEYS order.
+            seasons (list<str>): Names of the seasons to choose from.
+            rows (ndarray): Rows to choose from, by default every destination,
+                after compacting the catalog.
+
+        Return:
+            (ndarray): Rows of the skyline, by descending score, then cost,
+                crime and row.
+        """
+        if rows is None:
+            self.compact()
+            rows = np.arange(len(self), dtype=np.int64)
+        scores, _ = self.score_best(preferences, seasons, rows)
+        costs = self._costs[rows]
+        crimes = self._crimes[rows]
+
+        grid = np.full((len(self._cost_labels), len(self._crime_labels)), -np.inf)
+        np.maximum.at(grid, (costs, crimes), scores)
+        # Best score in any cell at or below each cell
+        at_most = np.maximum.accumulate(np.maximum.accumulate(grid, axis=0), axis=1)
+        # Best score in the cells below each cell, leaving the cell itself out
+        below = np.full_like(at_most, -np.inf)
+        below[1:, :] = at_most[:-1, :]
+        below[:, 1:] = np.maximum(below[:, 1:], at_most[:, :-1])
+
+        front = (scores >= at_most[costs, crimes]) & (scores > below[costs, crimes])
+        rows, scores, costs, crimes = rows[front], scores[front], costs[front], crimes[front]
+        return rows[np.lexsort((rows, crimes, costs, -scores))]
+
+
+def season_mask(seasons):
+    """(int) Return a set of seasons as a bit mask, with bit i set for SEASON_KEYS[i].
+
+    Parameters:
+        seasons (list<str>): Names of the seasons.
+    """
+    mask = 0
+    for season in seasons:
+        mask |= 1 << _SEASON_COLUMNS[season]
+    return mask
+
+
+def season_extremes(factors, mask):
+    """(tuple<ndarray>) Return the SEASON_KEYS column of each row's largest
+    and smallest factor among a set of seasons.
+
+    A destination's best season is the one with the largest factor when its
+    interest score is positive and the one with the smallest factor when it
+    is negative, see best_season_columns. The first such season wins ties.
+
+    Parameters:
+        factors (ndarray): N x 4 season factor matrix.
+        mask (int): season_mask of the seasons.
+    """
+    columns = np.flatnonzero(mask >> np.arange(len(SEASON_KEYS)) & 1).astype(np.int8)
+    if len(columns) == 0:
+        return np.zeros(len(factors), dtype=np.int8), np.zeros(len(factors), dtype=np.int8)
+    chosen = factors[:, columns]
+    return columns[chosen.argmax(axis=1)], columns[chosen.argmin(axis=1)]
+
+
+def best_season_columns(interest_scores, largest, smallest, mask):
+    """(ndarray) Return the column of the season each interest score is best in.
+
+    Parameters:
+        interest_scores (ndarray): Weighted interest sums.
+        largest (ndarray): Column of the largest factor for each score.
+        smallest (ndarray): Column of the smallest factor for each score.
+        mask (int | ndarray): season_mask of the seasons, for each score.
+    """
+    # With an interest score of 0 every season scores 0, so take the first
+    first = np.asarray(_FIRST_SEASON)[mask]
+    return np.where(interest_scores > 0, largest,
+                    np.where(interest_scores < 0, smallest, first))
+
+
+def interest_weights(preferences):
+    """(ndarray) Return the preference weights as a vector in INTEREST_KEYS order.
+
+    Parameters:
+        preferences (dict<str, int> | list<int>): Weight of each interest,
+            either keyed by interest name or in INTEREST_KEYS order.
+            Interests missing from a dict have a weight of 0.
+    """
+    if isinstance(preferences, dict):
+        preferences = [preferences.get(key, 0) for key in INTEREST_KEYS]
+    weights = np.array(preferences, dtype=np.int64)
+    if weights.shape != (len(INTEREST_KEYS),):
+        raise ValueError("Expected {} interest weights, got {}".format(
+            len(INTEREST_KEYS), weights.shape))
+    return weights
+
+
+def read_delta(filename):
+    """Read a file of changes to a destination database.
+
+    The file has the same columns as the database plus an "op" column of
+    "add", "update" or "remove". Only the name is needed to remove a
+    destination.
+
+    Parameters:
+        filename (str): Name of file containing the changes.
+
+    Return:
+        (tuple<list, list, list>): The adds, updates and removes, ready for
+            Destinations.apply_delta.
+    """
+    adds = []
+    updates = []
+    removes = []
+    with open(filename) as delta_file:
+        for row in csv.DictReader(delta_file):
+            operation = row.pop('op')
+            if operation == 'add':
+                adds.append(row)
+            elif operation == 'update':
+                updates.append(row)
+            elif operation == 'remove':
+                removes.append(row['name'])
+            else:
+                raise ValueError("Unknown delta operation {!r} for {}".format(operation, row['name']))
+    return adds, updates, removes
 
 
 # Check if an attempt is made to execute this module and output error message.
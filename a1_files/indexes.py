@@ -0,0 +1,440 @@
+"""
+Indexes over the hard constraints of the Destinations catalog.
+
+Finds the destinations a profile may travel to without testing every
+destination against every continent, cost, crime level, kid option and
+climate.
+"""
+
+import numpy as np
+
+from profiling import timed
+
+
+# Use the posting lists instead of the bitsets when they hold fewer
+# than one in SELECTIVE_FRACTION of the destinations.
+SELECTIVE_FRACTION = 64
+
+
+# Combines a continent code and a climate code into one posting list key
+PAIR_BASE = 256
+
+_NO_ROWS = np.empty(0, dtype=np.int64)
+
+
+def pair_keys(continents, climates):
+    """(ndarray) Return the posting list key of each continent and climate code."""
+    return continents.astype(np.int64) * PAIR_BASE + climates
+
+
+def _group(keys, rows):
+    """(dict<int, ndarray>) Split rows into groups by their sorted keys."""
+    if len(keys) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+    stops = np.r_[starts[1:], len(keys)]
+    return {int(keys[start]): rows[start:stop].astype(np.int64)
+            for start, stop in zip(starts.tolist(), stops.tolist())}
+
+
+def _group_rows(keys, rows):
+    """(dict<int, ndarray>) Split rows into sorted groups by their keys."""
+    order = np.lexsort((rows, keys))
+    return _group(keys[order], rows[order])
+
+
+def _bitset(mask):
+    """(ndarray) Return a boolean mask packed eight rows to a byte."""
+    return np.packbits(mask)
+
+
+def _bit_values(rows):
+    """(ndarray) Return the bit of each row within its byte of a bitset."""
+    return (0x80 >> (rows & 7)).astype(np.uint8)
+
+
+def _set_bits(bits, rows):
+    """Add rows to a bitset."""
+    np.bitwise_or.at(bits, rows >> 3, _bit_values(rows))
+
+
+def _clear_bits(bits, rows):
+    """Take rows out of a bitset."""
+    np.bitwise_and.at(bits, rows >> 3, ~_bit_values(rows))
+
+
+def _order(levels, rows, count):
+    """(tuple<ndarray>) Return the rows sorted by their level, keeping the rows of
+    a level in order, and the end of each of count levels' run.
+    """
+    order = rows[np.argsort(levels[rows], kind='stable')]
+    return order, np.searchsorted(levels[order], np.arange(count), side='right')
+
+
+def _order_positions(order, stops, levels, rows):
+    """(ndarray) Return where each (level, row) is, or would go, in a row order."""
+    starts = np.r_[0, stops[:-1]]
+    positions = np.empty(len(rows), dtype=np.int64)
+    for level in np.unique(levels).tolist():
+        chosen = levels == level
+        run = order[starts[level]:stops[level]]
+        positions[chosen] = starts[level] + np.searchsorted(run, rows[chosen])
+    return positions
+
+
+def _edit_order(order, stops, taken_levels, taken_rows, put_levels, put_rows):
+    """(tuple<ndarray>) Take rows out of a row order from _order and put others in.
+
+    Return:
+        (tuple<ndarray>): The new order and the end of each level's run.
+    """
+    if len(taken_rows):
+        order = np.delete(order, _order_positions(order, stops, taken_levels, taken_rows))
+        stops = stops - np.cumsum(np.bincount(taken_levels, minlength=len(stops)))
+    if len(put_rows):
+        sort = np.lexsort((put_rows, put_levels))
+        put_levels, put_rows = put_levels[sort], put_rows[sort]
+        order = np.insert(order, _order_positions(order, stops, put_levels, put_rows), put_rows)
+        stops = stops + np.cumsum(np.bincount(put_levels, minlength=len(stops)))
+    return order, stops
+
+
+class ConstraintIndex:
+    """Bitsets and posting lists over the categorical destination columns.
+
+    There is a bitset for each continent, climate and for the kid friendly
+    destinations. Cost and crime are ordered, so their bitsets hold every
+    destination at or below each level, and "cost <= tier" is a single
+    bitset. Each (continent, climate) pair also keeps a sorted list of its
+    rows, so that a selective query only touches the rows it returns.
+    The rows are also kept sorted by cost and by crime, where
+    "cost <= tier" is a prefix, for queries on the cheapest or safest
+    destinations. Rows of removed destinations are left out of all of them.
+    """
+    def __init__(self, destinations):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to index.
+        """
+        self._destinations = destinations
+        self._build_bitsets()
+
+        rows = np.arange(self._count, dtype=np.int64)
+        if destinations.get_removed() is not None:
+            rows = rows[~destinations.get_removed()]
+
+        # Rows grouped by (continent, climate), each group in catalog order
+        pairs = pair_keys(destinations.get_continents()[rows], destinations.get_climates()[rows])
+        order = np.argsort(pairs, kind='stable')
+        self._pairs = _group(pairs[order], rows[order])
+
+        # Rows by cost and by crime, with the end of each level's run
+        self._by_cost, self._cost_stops = _order(
+            destinations.get_costs(), rows, len(destinations.get_labels('cost')))
+        self._by_crime, self._crime_stops = _order(
+            destinations.get_crimes(), rows, len(destinations.get_labels('crime')))
+
+    def _build_bitsets(self):
+        """Build every bitset from the catalog columns, leaving out removed rows."""
+        destinations = self._destinations
+        continents = destinations.get_continents()
+        climates = destinations.get_climates()
+        costs = destinations.get_costs()
+        crimes = destinations.get_crimes()
+        self._count = len(continents)
+        live = destinations.get_removed()
+        live = np.ones(self._count, dtype=bool) if live is None else ~live
+
+        self._continents = [_bitset((continents == code) & live)
+                            for code in range(len(destinations.get_labels('continent')))]
+        self._climates = [_bitset((climates == code) & live)
+                          for code in range(len(destinations.get_labels('climate')))]
+        self._costs_at_most = [_bitset((costs <= code) & live)
+                               for code in range(len(destinations.get_labels('cost')))]
+        self._crimes_at_most = [_bitset((crimes <= code) & live)
+                                for code in range(len(destinations.get_labels('crime')))]
+        self._kid_friendly = _bitset(destinations.get_kids() & live)
+        self._everything = _bitset(live)
+
+    def _bitsets(self):
+        """(list<ndarray>) Return every bitset."""
+        return self._continents + self._climates + self._costs_at_most + self._crimes_at_most \
+            + [self._kid_friendly, self._everything]
+
+    def _fit_bitsets(self):
+        """Make room in the bitsets for every row and add those of new labels."""
+        destinations = self._destinations
+        self._count = len(destinations.get_continents())
+        size = (self._count + 7) // 8
+        if len(self._everything) < size:
+            # Spare bytes, so that adding a few rows at a time rarely copies the bitsets
+            spare = np.zeros(size + size // 8 - len(self._everything), dtype=np.uint8)
+            for bitsets in (self._continents, self._climates, self._costs_at_most,
+                            self._crimes_at_most):
+                bitsets[:] = [np.concatenate([bits, spare]) for bits in bitsets]
+            self._kid_friendly = np.concatenate([self._kid_friendly, spare])
+            self._everything = np.concatenate([self._everything, spare])
+
+        # New labels take the next codes, so no row has one yet: their bitsets
+        # start empty, or for cost and crime, the same as the level below
+        for bitsets, column in ((self._continents, 'continent'), (self._climates, 'climate')):
+            while len(bitsets) < len(destinations.get_labels(column)):
+                bitsets.append(np.zeros_like(self._everything))
+        for bitsets, column in ((self._costs_at_most, 'cost'), (self._crimes_at_most, 'crime')):
+            while len(bitsets) < len(destinations.get_labels(column)):
+                bitsets.append(bitsets[-1].copy() if bitsets else np.zeros_like(self._everything))
+
+    def _set_rows(self, rows):
+        """Add rows to the bitsets their column values belong in."""
+        destinations = self._destinations
+        continents = destinations.get_continents()[rows]
+        climates = destinations.get_climates()[rows]
+        costs = destinations.get_costs()[rows]
+        crimes = destinations.get_crimes()[rows]
+        for code, bits in enumerate(self._continents):
+            _set_bits(bits, rows[continents == code])
+        for code, bits in enumerate(self._climates):
+            _set_bits(bits, rows[climates == code])
+        for code, bits in enumerate(self._costs_at_most):
+            _set_bits(bits, rows[costs <= code])
+        for code, bits in enumerate(self._crimes_at_most):
+            _set_bits(bits, rows[crimes <= code])
+        _set_bits(self._kid_friendly, rows[destinations.get_kids()[rows]])
+        _set_bits(self._everything, rows)
+
+    def apply_delta(self, removed, updated, previous, added_from):
+        """Bring the index up to date after Destinations.apply_delta.
+
+        Only the bits, posting list entries and order entries of the changed
+        rows are touched.
+
+        Parameters:
+            removed (ndarray): Sorted rows of removed destinations.
+            updated (ndarray): Rows changed in place.
+            previous (dict<str, ndarray>): The 'continent', 'climate', 'cost'
+                and 'crime' codes of the updated rows before the change.
+            added_from (int): Row of the first added destination.
+        """
+        destinations = self._destinations
+        self._fit_bitsets()
+        added = np.arange(added_from, self._count, dtype=np.int64)
+
+        for bits in self._bitsets():
+            _clear_bits(bits, removed)
+            _clear_bits(bits, updated)
+        self._set_rows(updated)
+        self._set_rows(added)
+
+        # Posting lists: removed rows leave their pair's list, moved rows
+        # change list and added rows join one
+        removed_pairs = pair_keys(destinations.get_continents()[removed],
+                                  destinations.get_climates()[removed])
+        before = pair_keys(previous['continent'], previous['climate'])
+        after = pair_keys(destinations.get_continents()[updated],
+                          destinations.get_climates()[updated])
+        moved = before != after
+        added_pairs = pair_keys(destinations.get_continents()[added],
+                                destinations.get_climates()[added])
+        taken = _group_rows(np.concatenate([removed_pairs, before[moved]]),
+                            np.concatenate([removed, updated[moved]]))
+        put = _group_rows(np.concatenate([after[moved], added_pairs]),
+                          np.concatenate([updated[moved], added]))
+        for key in taken.keys() | put.keys():
+            rows = self._pairs.get(key, _NO_ROWS)
+            if key in taken:
+                rows = np.delete(rows, np.searchsorted(rows, taken[key]))
+            if key in put:
+                rows = np.insert(rows, np.searchsorted(rows, put[key]), put[key])
+            if len(rows):
+                self._pairs[key] = rows
+            else:
+                self._pairs.pop(key, None)
+
+        # Cost and crime orders, the same way
+        for column, attribute in (('cost', '_cost'), ('crime', '_crime')):
+            order = getattr(self, '_by' + attribute)
+            stops = getattr(self, attribute + '_stops')
+            labels = len(destinations.get_labels(column))
+            if len(stops) < labels:
+                stops = np.r_[stops, np.full(labels - len(stops), len(order))]
+            codes = {'cost': destinations.get_costs(), 'crime': destinations.get_crimes()}[column]
+            changed = previous[column] != codes[updated]
+            order, stops = _edit_order(
+                order, stops,
+                np.concatenate([codes[removed], previous[column][changed]]).astype(np.int64),
+                np.concatenate([removed, updated[changed]]),
+                np.concatenate([codes[updated][changed], codes[added]]).astype(np.int64),
+                np.concatenate([updated[changed], added]))
+            setattr(self, '_by' + attribute, order)
+            setattr(self, attribute + '_stops', stops)
+
+    def compact(self, renumber):
+        """Renumber the rows after Destinations.compact.
+
+        Parameters:
+            renumber (ndarray): New row of each old row that is kept.
+        """
+        self._pairs = {key: renumber[rows] for key, rows in self._pairs.items()}
+        self._by_cost = renumber[self._by_cost]
+        self._by_crime = renumber[self._by_crime]
+        self._build_bitsets()
+
+    def _codes(self, column, labels):
+        """(list<int>) Return the codes of the labels present in the column."""
+        known = self._destinations.get_labels(column)
+        return [known.index(label) for label in labels if label in known]
+
+    def pair_rows(self, continent, climate):
+        """(ndarray) Return the sorted rows with the continent and climate codes."""
+        return self._pairs.get(continent * PAIR_BASE + climate, _NO_ROWS)
+
+    @timed('filter')
+    def candidates(self, profile):
+        """(ndarray) Return the sorted rows of the destinations the profile allows.
+
+        Parameters:
+            profile (Profile): Validated questionnaire answers.
+        """
+        continents = sorted(set(self._codes('continent', profile.get_continents())))
+        climates = self._codes('climate', [profile.get_climate()])
+        costs = self._codes('cost', [profile.get_cost()])
+        crimes = self._codes('crime', [profile.get_crime()])
+        if not continents or not climates or not costs or not crimes:
+            return np.empty(0, dtype=np.int64)
+        climate, cost, crime = climates[0], costs[0], crimes[0]
+
+        size = sum(len(self.pair_rows(continent, climate)) for continent in continents)
+        range_size = min(self._cost_stops[cost], self._crime_stops[crime])
+        if range_size < size and range_size * SELECTIVE_FRACTION < self._count:
+            return self._filter_range(continents, climate, cost, crime, profile.has_kids())
+        if size * SELECTIVE_FRACTION < self._count:
+            return self._filter_pairs(continents, climate, cost, crime, profile.has_kids())
+
+        bits = np.zeros_like(self._everything)
+        for continent in continents:
+            bits |= self._continents[continent]
+        bits &= self._climates[climate]
+        bits &= self._costs_at_most[cost]
+        bits &= self._crimes_at_most[crime]
+        if profile.has_kids():
+            bits &= self._kid_friendly
+        return np.flatnonzero(np.unpackbits(bits, count=self._count))
+
+    def at_most(self, cost, crime):
+        """(ndarray) Return the sorted rows with a cost and crime code at most those given.
+
+        The shorter of the two prefixes, of the rows by cost and by crime,
+        is read and checked against the other limit.
+        """
+        destinations = self._destinations
+        by_cost = self._by_cost[:self._cost_stops[cost]]
+        by_crime = self._by_crime[:self._crime_stops[crime]]
+        if len(by_cost) <= len(by_crime):
+            rows = by_cost[destinations.get_crimes()[by_cost] <= crime]
+        else:
+            rows = by_crime[destinations.get_costs()[by_crime] <= cost]
+        return np.sort(rows)
+
+    def _filter_range(self, continents, climate, cost, crime, kids):
+        """(ndarray) Return the allowed rows read from the cost and crime orders."""
+        destinations = self._destinations
+        rows = self.at_most(cost, crime)
+        keep = np.isin(destinations.get_continents()[rows], continents) \
+            & (destinations.get_climates()[rows] == climate)
+        if kids:
+            keep &= destinations.get_kids()[rows]
+        return rows[keep]
+
+    def _filter_pairs(self, continents, climate, cost, crime, kids):
+        """(ndarray) Return the allowed rows read from the (continent, climate) posting lists."""
+        rows = np.sort(np.concatenate([self.pair_rows(continent, climate)
+                                       for continent in continents]))
+        keep = (self._destinations.get_costs()[rows] <= cost) \
+            & (self._destinations.get_crimes()[rows] <= crime)
+        if kids:
+            keep &= self._destinations.get_kids()[rows]
+        return rows[keep]
+
+
+class BucketBounds:
+    """Largest and smallest interest scores and season factors of each (continent, climate) bucket.
+
+    Give an optimistic upper bound on the score of every destination in a
+    bucket, so a search can skip the buckets that cannot beat the best
+    destination found so far. The bounds stay valid when destinations are
+    removed, and widen to take in destinations that are added or updated.
+    """
+    def __init__(self, destinations):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to bound.
+        """
+        self._destinations = destinations
+        self._buckets = {}
+        interests = destinations.get_interests()
+        factors = destinations.get_season_factors()
+        self._interest_max = np.empty((0, interests.shape[1]), dtype=np.int64)
+        self._interest_min = np.empty((0, interests.shape[1]), dtype=np.int64)
+        self._factor_max = np.empty((0, factors.shape[1]))
+        self._factor_min = np.empty((0, factors.shape[1]))
+        # Removed rows not yet compacted away only widen the bounds, so they are kept
+        self.widen(np.arange(len(destinations.get_continents()), dtype=np.int64))
+
+    def widen(self, rows):
+        """Take the given destinations into the bounds of their buckets.
+
+        Parameters:
+            rows (ndarray): Rows of new or changed destinations.
+        """
+        destinations = self._destinations
+        pairs = pair_keys(destinations.get_continents()[rows], destinations.get_climates()[rows])
+        order = np.argsort(pairs, kind='stable')
+        for key, bucket_rows in _group(pairs[order], rows[order]).items():
+            interests = destinations.get_interests()[bucket_rows]
+            factors = destinations.get_season_factors()[bucket_rows]
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = len(self._buckets)
+                self._interest_max = np.vstack([self._interest_max, interests.max(axis=0)])
+                self._interest_min = np.vstack([self._interest_min, interests.min(axis=0)])
+                self._factor_max = np.vstack([self._factor_max, factors.max(axis=0)])
+                self._factor_min = np.vstack([self._factor_min, factors.min(axis=0)])
+            else:
+                np.maximum(self._interest_max[bucket], interests.max(axis=0),
+                           out=self._interest_max[bucket])
+                np.minimum(self._interest_min[bucket], interests.min(axis=0),
+                           out=self._interest_min[bucket])
+                np.maximum(self._factor_max[bucket], factors.max(axis=0),
+                           out=self._factor_max[bucket])
+                np.minimum(self._factor_min[bucket], factors.min(axis=0),
+                           out=self._factor_min[bucket])
+
+    def upper_bounds(self, keys, weights, columns):
+        """(ndarray) Return the highest score any destination in each bucket could have.
+
+        Parameters:
+            keys (list<int>): pair_keys of the buckets.
+            weights (ndarray): Interest weights in INTEREST_KEYS order.
+            columns (list<int>): SEASON_KEYS columns of the seasons.
+        """
+        buckets = [self._buckets[key] for key in keys]
+        positive = weights > 0
+        highest = np.where(positive, weights * self._interest_max[buckets],
+                           weights * self._interest_min[buckets]).sum(axis=1)
+        lowest = np.where(positive, weights * self._interest_min[buckets],
+                          weights * self._interest_max[buckets]).sum(axis=1)
+        factor_max = self._factor_max[buckets][:, columns].max(axis=1)
+        factor_min = self._factor_min[buckets][:, columns].min(axis=1)
+        # A factor times an interest score is largest at a corner of their ranges
+        return np.max([factor_max * highest, factor_min * highest,
+                       factor_max * lowest, factor_min * lowest], axis=0)
+
+    def has_bucket(self, key):
+        """(bool) Return if any destination has been in the bucket with the pair key."""
+        return key in self._buckets
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the destination indexes for Travel Inspiration",
+          "and is not meant to be executed on its own.")
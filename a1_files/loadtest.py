@@ -0,0 +1,140 @@
+"""
+Load test for the Travel Inspiration recommendation service.
+
+Sends random questionnaires to a running service.py from a number of
+concurrent keep-alive connections and reports the request latency
+percentiles and throughput. With --spawn, a service is started for the
+duration of the test.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+
+
+def random_answers(rng):
+    """(dict<str, str>) Return a random valid set of answers to the questionnaire."""
+    answers = {
+        'name': 'load test',
+        'continent': ','.join(str(choice) for choice in rng.sample(range(1, 8), rng.randint(1, 7))),
+        'cost': rng.choice(['$', '$$', '$$$']),
+        'crime': str(rng.randint(1, 3)),
+        'children': str(rng.randint(1, 2)),
+        'season': ','.join(str(choice) for choice in rng.sample(range(1, 5), rng.randint(1, 4))),
+        'climate': str(rng.randint(1, 5)),
+    }
+    for key in ('sports', 'wildlife', 'nature', 'historical', 'cuisine', 'adventure', 'beach'):
+        answers[key] = str(rng.randint(-5, 5))
+    return answers
+
+
+def percentile(ordered, fraction):
+    """(float) Return the value below which the fraction of the sorted values fall."""
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def _client(host, port, bodies, latencies):
+    """Send each body on one keep-alive connection, recording the latency of each request."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for body in bodies:
+            start = time.perf_counter()
+            writer.write('POST /recommend HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\n'
+                         'Content-Length: {}\r\n\r\n'.format(host, len(body)).encode() + body)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - start)
+            if b' 200 ' not in status:
+                raise RuntimeError('request failed: ' + status.decode().strip())
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, requests, concurrency, seed=0):
+    """(dict) Send the requests from concurrent clients and return the latency report.
+
+    Parameters:
+        host (str): Address of the service.
+        port (int): Port of the service.
+        requests (int): Total number of requests to send.
+        concurrency (int): Number of connections sending at once.
+        seed (int): Seed for the random questionnaires.
+    """
+    rng = random.Random(seed)
+    bodies = [json.dumps(random_answers(rng)).encode() for _ in range(requests)]
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, bodies[client::concurrency], latencies)
+                           for client in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
+
+def _wait_for_port(host, port, timeout=10):
+    """Wait until a service is accepting connections on the port."""
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main():
+    """Send the requests to the service and print the latency and throughput report."""
+    parser = argparse.ArgumentParser(description="Load test the Travel Inspiration service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--spawn', action='store_true',
+                        help="start service.py for the duration of the test")
+    parser.add_argument('--destinations', default='destinations.csv',
+                        help="destination database for the spawned service")
+    options = parser.parse_args()
+
+    service = None
+    if options.spawn:
+        service = subprocess.Popen([sys.executable, 'service.py', '--host', options.host,
+                                    '--port', str(options.port),
+                                    '--destinations', options.destinations])
+    try:
+        _wait_for_port(options.host, options.port)
+        report = asyncio.run(run_load(options.host, options.port,
+                                      options.requests, options.concurrency))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
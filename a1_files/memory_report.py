@@ -0,0 +1,93 @@
+"""
+Reports the memory used per Destination record.
+
+Builds the same synthetic rows as Destination objects and as the
+previous layout (an instance __dict__ holding a dict of interest scores
+and a dict of season factors) and prints the bytes per destination of
+each, measured with tracemalloc. The names are shared by both layouts
+and are not counted.
+"""
+
+import argparse
+import json
+import random
+import tracemalloc
+
+from destinations import (CLIMATES, CONTINENTS, COSTS, CRIMES, Destination,
+                          INTEREST_KEYS, SEASON_KEYS)
+
+
+class DictDestination:
+    """A destination stored the way Destination used to store it."""
+    def __init__(self, name, continent, climate, cost, crime, kid_friendly, interest_scores, season_factors):
+        self._name = name
+        self._climate = climate
+        self._continent = continent
+        self._cost = cost
+        self._crime = crime
+        self._interest_scores = interest_scores
+        self._kid_friendly = kid_friendly
+        self._season_factors = season_factors
+
+
+def _rows(count, seed=0):
+    """Yield count random rows as they are read from the database, one string per cell."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ([rng.choice(CONTINENTS), rng.choice(CLIMATES), rng.choice(COSTS),
+                rng.choice(CRIMES), rng.random() < 0.5],
+               [str(rng.randint(0, 5)) for _ in INTEREST_KEYS],
+               ['{:.2f}'.format(rng.uniform(1, 4)) for _ in SEASON_KEYS])
+
+
+def measure(build, names, seed=0):
+    """(float) Return the bytes per destination allocated by build for each row.
+
+    Parameters:
+        build (callable): Builds one record from a name and a row.
+        names (list<str>): Name of each record.
+        seed (int): Seed for the random rows.
+    """
+    rows = list(_rows(len(names), seed))
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(name, *row) for name, row in zip(names, rows)]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del records
+    return used / len(names)
+
+
+def build_dict(name, attributes, interests, seasons):
+    """(DictDestination) Build a record in the previous layout."""
+    return DictDestination(name, *attributes,
+                           {key: int(value) for key, value in zip(INTEREST_KEYS, interests)},
+                           {key: float(value) for key, value in zip(SEASON_KEYS, seasons)})
+
+
+def build_compact(name, attributes, interests, seasons):
+    """(Destination) Build a record in the current layout."""
+    return Destination(name, *attributes,
+                       [int(value) for value in interests],
+                       [float(value) for value in seasons])
+
+
+def main():
+    """Print the memory used per destination before and after the compact layout."""
+    parser = argparse.ArgumentParser(description="Report the memory used per Destination record.")
+    parser.add_argument('--rows', type=int, default=1000000)
+    options = parser.parse_args()
+
+    names = ['Destination {}'.format(row) for row in range(options.rows)]
+    before = measure(build_dict, names)
+    after = measure(build_compact, names)
+    print(json.dumps({
+        'rows': options.rows,
+        'bytes_per_destination_before': round(before, 1),
+        'bytes_per_destination_after': round(after, 1),
+        'saving': round(1 - after / before, 3),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
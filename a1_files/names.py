@@ -0,0 +1,183 @@
+"""
+Destination names for Travel Inspiration.
+
+Finds every destination name in a piece of text with an Aho-Corasick
+automaton, which reads the text once whatever the number of names,
+instead of trying each name at each position of the text. Also stores a
+list of names as one block of bytes, which can be shared between
+processes.
+"""
+
+from collections import deque
+from collections.abc import Sequence
+from operator import index
+
+import numpy as np
+
+
+def _lower(text):
+    """(str) Return the text in lower case, one character for each character of the text."""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters lower to more than one, those are left as they are
+    return ''.join(char.lower() if len(char.lower()) == 1 else char for char in text)
+
+
+class NameTable(Sequence):
+    """Read-only list of names stored as UTF-8 bytes with the offset of each name.
+
+    The bytes and offsets can live in any buffer, such as shared memory,
+    and each name is decoded when it is read.
+    """
+    def __init__(self, data, offsets):
+        """
+        Parameters:
+            data (ndarray): uint8 array of the encoded names, one after another.
+            offsets (ndarray): int64 array of the start of each name in data,
+                followed by the end of the last name.
+        """
+        self._data = data
+        self._offsets = offsets
+
+    @staticmethod
+    def encode(names):
+        """(tuple<ndarray>) Return the data and offsets of a NameTable of the names.
+
+        Parameters:
+            names (list<str>): Names to store.
+        """
+        encoded = [name.encode('utf-8') for name in names]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)),
+                  out=offsets[1:])
+        return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        row = index(row)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("name index out of range")
+        return self._data[self._offsets[row]:self._offsets[row + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        data = self._data.tobytes()
+        offsets = self._offsets.tolist()
+        for start, stop in zip(offsets, offsets[1:]):
+            yield data[start:stop].decode('utf-8')
+
+
+class NameMatcher:
+    """Finds names in text, like a regular expression of the names joined by "|".
+
+    Where names overlap, the one starting first is taken and, of those
+    starting at the same place, the longest, as re would with the longer
+    names tried first. Matches do not overlap.
+    """
+    def __init__(self, names, ignore_case=False):
+        """
+        Parameters:
+            names (iter<str>): Names to look for.
+            ignore_case (bool): Match the names in upper or lower case.
+        """
+        self._ignore_case = ignore_case
+        # Trie of the names: the next node on each character, the length of
+        # the name ending at each node (0 for none) and the failure links
+        self._next = [{}]
+        self._length = [0]
+        for name in names:
+            if not name:
+                continue
+            node = 0
+            for char in (_lower(name) if ignore_case else name):
+                following = self._next[node].get(char)
+                if following is None:
+                    following = self._next[node][char] = len(self._next)
+                    self._next.append({})
+                    self._length.append(0)
+                node = following
+            self._length[node] = len(name)
+        self._build_links()
+
+    def _build_links(self):
+        """Link each node to the node of its longest proper suffix in the trie,
+        and to the nearest of those suffixes that ends a name.
+        """
+        self._fail = [0] * len(self._next)
+        self._output = [0] * len(self._next)
+        queue = deque(self._next[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._next[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._next[fail]:
+                    fail = self._fail[fail]
+                fail = self._next[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output[child] = fail if self._length[fail] else self._output[fail]
+                queue.append(child)
+
+    def finditer(self, text):
+        """Yield the (start, stop) span of each name in the text, in order.
+
+        Parameters:
+            text (str): Text to search.
+        """
+        searched = _lower(text) if self._ignore_case else text
+        next_nodes, fail, length, output = self._next, self._fail, self._length, self._output
+
+        # Longest name starting at each position of the text
+        longest = {}
+        node = 0
+        for stop, char in enumerate(searched, 1):
+            while node and char not in next_nodes[node]:
+                node = fail[node]
+            node = next_nodes[node].get(char, 0)
+            found = node if length[node] else output[node]
+            while found:
+                start = stop - length[found]
+                if length[found] > longest.get(start, 0):
+                    longest[start] = length[found]
+                found = output[found]
+
+        position = 0
+        for start in sorted(longest):
+            if start >= position:
+                position = start + longest[start]
+                yield start, position
+
+    def findall(self, text):
+        """(list<str>) Return each name in the text, as it is written in the text.
+
+        Parameters:
+            text (str): Text to search.
+        """
+        return [text[start:stop] for start, stop in self.finditer(text)]
+
+    def sub(self, replacement, text):
+        """(str) Return the text with each name in it replaced.
+
+        Parameters:
+            replacement (str): Text to put in place of each name.
+            text (str): Text to search.
+        """
+        pieces = []
+        position = 0
+        for start, stop in self.finditer(text):
+            pieces.append(text[position:start])
+            pieces.append(replacement)
+            position = stop
+        pieces.append(text[position:])
+        return ''.join(pieces)
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the destination names for Travel Inspiration",
+          "and is not meant to be executed on its own.")
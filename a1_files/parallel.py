@@ -0,0 +1,139 @@
+"""
+Parallel recommendation engine for Travel Inspiration.
+
+Publishes the Destinations catalog in shared memory, grouped by
+continent, scores each continent a profile can travel to in a pool of
+worker processes attached to it and merges the best destinations of each
+continent. A worker only reads its continent's slice of the columns, so
+it builds nothing over the whole catalog.
+"""
+
+import heapq
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from recommender import recommend, top_rows_between
+from shared_catalog import SharedCatalog
+
+
+# Catalogs with fewer destinations than this are scored in this process,
+# where they take less time than sending the work to another process.
+SERIAL_THRESHOLD = 100000
+
+# Catalog attached by each worker process
+_worker_catalog = None
+
+
+def _start_worker(handle):
+    """Attach a new worker process to the shared catalog for its later tasks."""
+    global _worker_catalog
+    _worker_catalog = SharedCatalog.attach(handle)
+
+
+def _recommend_continent(continent, profile, k):
+    """(list<tuple<int, str, float, str>>) Return the k best destinations on one continent.
+
+    Each result is the published catalog's row, best season, score and name.
+
+    Parameters:
+        continent (int): Code of the continent.
+    """
+    destinations = _worker_catalog.get_destinations()
+    start, stop = _worker_catalog.get_group(continent)
+    rows = _worker_catalog.get_original_rows()
+    return [(int(rows[row]), season, score, destinations.get_name(row))
+            for row, season, score in top_rows_between(destinations, profile, start, stop, k)]
+
+
+class ParallelRecommender:
+    """Scores the catalog's continents in a persistent process pool.
+
+    The workers share one copy of the catalog, published in shared memory,
+    so the memory used does not grow with the number of workers. When the
+    catalog changes, such as with apply_delta, it is published again
+    before the next recommendation. Use as a
+    context manager, or call close once finished, to stop the worker
+    processes and free the shared memory.
+    """
+    def __init__(self, destinations, workers=None, serial_threshold=SERIAL_THRESHOLD):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to recommend from.
+            workers (int): Number of worker processes, by default one per CPU.
+            serial_threshold (int): Catalogs smaller than this are scored
+                in this process without starting any workers.
+        """
+        self._destinations = destinations
+        self._workers = workers or os.cpu_count() or 1
+        self._pool = None
+        self._shared = None
+        self._continents = set()
+        self._version = None
+
+        if self._workers > 1 and len(destinations) >= serial_threshold:
+            self._publish()
+
+    def _publish(self):
+        """Publish the catalog as it is now and start workers attached to it."""
+        self.close()
+        self._shared = SharedCatalog.publish(self._destinations, group_by='continent')
+        # Taken after publishing, which compacts the catalog
+        self._version = self._destinations.get_version()
+        self._continents = set(self._shared.get_groups())
+        self._pool = ProcessPoolExecutor(max_workers=self._workers,
+                                         initializer=_start_worker,
+                                         initargs=(self._shared.get_handle(),))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stop the worker processes and free the shared catalog."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._shared is not None:
+            self._shared.close()
+            self._shared = None
+
+    def is_parallel(self):
+        """(bool) Return if the catalog is scored by worker processes."""
+        return self._pool is not None
+
+    def recommend(self, profile, k=10):
+        """(list<tuple<Destination, str, float>>) Return the k best destinations for a profile.
+
+        The result is the same as recommender.recommend on the whole catalog.
+
+        Parameters:
+            profile (Profile): Validated questionnaire answers.
+            k (int): Largest number of destinations to return.
+        """
+        if self._pool is None:
+            return recommend(self._destinations, profile, k)
+        if self._destinations.get_version() != self._version:
+            # The workers' rows are those of the catalog as last published
+            self._publish()
+
+        labels = self._destinations.get_labels('continent')
+        codes = {labels.index(continent) for continent in profile.get_continents()
+                 if continent in labels}
+        futures = [self._pool.submit(_recommend_continent, code, profile, k)
+                   for code in sorted(codes) if code in self._continents]
+
+        results = []
+        for future in futures:
+            for row, season, score, name in future.result():
+                results.append((-score, name, row, season))
+
+        return [(self._destinations.get_destination(row), season, -score)
+                for score, name, row, season in heapq.nsmallest(k, results)]
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the parallel recommendation engine for Travel Inspiration",
+          "and is not meant to be executed on its own.")
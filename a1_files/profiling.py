@@ -0,0 +1,157 @@
+"""
+Phase timing for Travel Inspiration.
+
+Records the wall clock time, CPU time and number of calls of each phase of
+a recommendation: loading the catalog, validating answers, filtering the
+destinations, scoring them and writing the output. Timing is off until
+enable is called, and while it is off a phase costs one global lookup.
+
+    profiler = profiling.enable()
+    ... run recommendations ...
+    profiling.disable()
+    print(profiler.to_json())
+"""
+
+import functools
+import json
+import time
+
+
+# Phases in the order they are reported
+PHASES = ('load', 'validation', 'filter', 'score', 'output')
+
+# Profiler recording the phases, or None while timing is off
+_profiler = None
+
+
+class _NoPhase:
+    """Phase that records nothing, used while timing is off."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_PHASE = _NoPhase()
+
+
+class _Phase:
+    """Times one run of a phase for a PhaseProfiler."""
+    __slots__ = ('_profiler', '_name', '_wall', '_cpu')
+
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._profiler.record(self._name, time.perf_counter() - self._wall,
+                              time.process_time() - self._cpu)
+        return False
+
+
+class PhaseProfiler:
+    """Totals of the time spent in each phase.
+
+    A phase run inside another, such as scoring inside a batch, counts
+    towards both.
+    """
+    def __init__(self):
+        # Calls, wall seconds and CPU seconds of each phase
+        self._phases = {}
+
+    def phase(self, name):
+        """(context manager) Time the block run inside it as one call of a phase.
+
+        Parameters:
+            name (str): Name of the phase, usually one of PHASES.
+        """
+        return _Phase(self, name)
+
+    def record(self, name, wall, cpu):
+        """Add one call of a phase.
+
+        Parameters:
+            name (str): Name of the phase.
+            wall (float): Wall clock seconds the call took.
+            cpu (float): CPU seconds the call took.
+        """
+        totals = self._phases.get(name)
+        if totals is None:
+            totals = self._phases[name] = [0, 0.0, 0.0]
+        totals[0] += 1
+        totals[1] += wall
+        totals[2] += cpu
+
+    def get_phases(self):
+        """(dict<str, dict>) Return the calls, wall_seconds and cpu_seconds of each phase,
+        in PHASES order followed by any other phases.
+        """
+        names = [name for name in PHASES if name in self._phases] \
+            + sorted(name for name in self._phases if name not in PHASES)
+        return {name: {'calls': self._phases[name][0],
+                       'wall_seconds': self._phases[name][1],
+                       'cpu_seconds': self._phases[name][2]}
+                for name in names}
+
+    def to_json(self):
+        """(str) Return the phases as a JSON object."""
+        return json.dumps({'phases': self.get_phases()}, indent=2)
+
+
+def enable(profiler=None):
+    """(PhaseProfiler) Start timing the phases and return the profiler recording them.
+
+    Parameters:
+        profiler (PhaseProfiler): Profiler to add to, by default a new one.
+    """
+    global _profiler
+    _profiler = profiler if profiler is not None else PhaseProfiler()
+    return _profiler
+
+
+def disable():
+    """(PhaseProfiler) Stop timing the phases and return the profiler that recorded them."""
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler
+
+
+def phase(name):
+    """(context manager) Time the block run inside it as one call of a phase,
+    if timing is on.
+
+    Parameters:
+        name (str): Name of the phase, usually one of PHASES.
+    """
+    if _profiler is None:
+        return _NO_PHASE
+    return _Phase(_profiler, name)
+
+
+def timed(name):
+    """Decorate a function so that each call is timed as one call of a phase.
+
+    Parameters:
+        name (str): Name of the phase, usually one of PHASES.
+    """
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return function(*args, **kwargs)
+            with _Phase(_profiler, name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the phase timing for Travel Inspiration",
+          "and is not meant to be executed on its own.")
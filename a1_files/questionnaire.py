@@ -0,0 +1,200 @@
+"""
+Questionnaire schema and answer validation for Travel Inspiration.
+
+Describes each question asked by travel.main: its prompt, the answers it
+accepts and the message shown for an invalid answer. The accepted answers
+of each question are worked out once, so checking an answer is a set
+lookup, and a whole record of answers can be checked without prompting.
+"""
+
+from profiling import timed
+
+
+# Questions answered by each record, in the order travel.main asks them
+ANSWER_KEYS = ["name", "continent", "cost", "crime", "children", "season", "climate",
+               "sports", "wildlife", "nature", "historical", "cuisine", "adventure", "beach"]
+INTEREST_ANSWER_KEYS = ["sports", "wildlife", "nature", "historical", "cuisine", "adventure", "beach"]
+INTEREST_ANSWERS = [str(score) for score in range(-5, 6)]
+
+
+class Question:
+    """One multiple choice question of the questionnaire."""
+    __slots__ = ('_key', '_prompt', '_choices', '_count', '_multiple', '_retry_end')
+
+    def __init__(self, key, prompt, choices, multiple=False, retry_end=""):
+        """
+        Parameters:
+            key (str): Key of the answer in a record, one of ANSWER_KEYS.
+            prompt (str): Text shown when asking the question.
+            choices (list<str>): Accepted answers. A multiple choice
+                question accepts "1" to str(len(choices)) instead.
+            multiple (bool): If True, the answer is a comma separated list
+                of menu choices, such as "1, 3".
+            retry_end (str): Text printed after the message for an invalid answer.
+        """
+        self._key = key
+        self._prompt = prompt
+        self._choices = frozenset(choices)
+        self._count = len(choices)
+        self._multiple = multiple
+        self._retry_end = retry_end
+
+    def get_key(self):
+        """(str) Return the key of the answer in a record."""
+        return self._key
+
+    def get_prompt(self):
+        """(str) Return the text shown when asking the question."""
+        return self._prompt
+
+    def get_retry_message(self, answer):
+        """(str) Return the message printed for an invalid answer.
+
+        Parameters:
+            answer (str): The invalid answer.
+        """
+        return "\nI'm sorry, but " + answer + " is not a valid choice. Please try again." \
+            + self._retry_end
+
+    def is_valid(self, answer):
+        """(bool) Return if the answer is accepted.
+
+        A list of menu choices is accepted if every choice is a whole number
+        on the menu, written in any way int() reads, such as " 3" or "03".
+
+        Parameters:
+            answer (str): A user's answer to the question.
+        """
+        if not self._multiple:
+            return answer in self._choices
+        choices = answer.split(",")
+        if self._choices.issuperset(choices):
+            return True
+        for choice in choices:
+            try:
+                number = int(choice)
+            except ValueError:
+                return False
+            if number < 1 or number > self._count:
+                return False
+        return True
+
+
+def _interest_question(key, prompt):
+    """(Question) Return a question answered on a scale of -5 to 5."""
+    return Question(key, "\nHow much do you like " + prompt + "? (-5 to 5)" + "\n> ",
+                    INTEREST_ANSWERS)
+
+
+# Every question after the user's name, keyed by answer key
+QUESTIONS = {question.get_key(): question for question in [
+    Question("continent",
+             "Which continents would you like to travel to?"
+             + "\n  1) Asia"
+             + "\n  2) Africa"
+             + "\n  3) North America"
+             + "\n  4) South America"
+             + "\n  5) Europe"
+             + "\n  6) Oceania"
+             + "\n  7) Antarctica"
+             + "\n> ",
+             [str(choice) for choice in range(1, 8)], multiple=True, retry_end="\n"),
+    Question("cost",
+             "\nWhat is money to you?"
+             + "\n  $$$) No object"
+             + "\n  $$) Spendable, so long as I get value from doing so"
+             + "\n  $) Extremely important; I want to spend as little as possible"
+             + "\n> ",
+             ["$", "$$", "$$$"]),
+    Question("crime",
+             "\nHow much crime is acceptable when you travel?"
+             + "\n  1) Low"
+             + "\n  2) Average"
+             + "\n  3) High"
+             + "\n> ",
+             ["1", "2", "3"]),
+    Question("children",
+             "\nWill you be travelling with children?"
+             + "\n  1) Yes"
+             + "\n  2) No"
+             + "\n> ",
+             ["1", "2"]),
+    Question("season",
+             "\nWhich seasons do you plan to travel in?"
+             + "\n  1) Spring"
+             + "\n  2) Summer"
+             + "\n  3) Autumn"
+             + "\n  4) Winter"
+             + "\n> ",
+             [str(choice) for choice in range(1, 5)], multiple=True, retry_end="\n"),
+    Question("climate",
+             "\nWhat climate do you prefer?"
+             + "\n  1) Cold"
+             + "\n  2) Cool"
+             + "\n  3) Moderate"
+             + "\n  4) Warm"
+             + "\n  5) Hot"
+             + "\n> ",
+             ["1", "2", "3", "4", "5"]),
+    _interest_question("sports", "sports"),
+    _interest_question("wildlife", "wildlife"),
+    _interest_question("nature", "nature"),
+    _interest_question("historical", "historical sites"),
+    _interest_question("cuisine", "fine dining"),
+    _interest_question("adventure", "adventure activities"),
+    _interest_question("beach", "the beach"),
+]}
+
+# (key, check) for each question, in the order a record is checked
+_CHECKS = tuple((key, QUESTIONS[key].is_valid) for key in ANSWER_KEYS if key in QUESTIONS)
+
+
+@timed("validation")
+def validate(answers):
+    """(str | None) Return a description of the first problem with a record of answers,
+    or None if every answer is valid.
+
+    Parameters:
+        answers (dict<str, str>): A user's answers, keyed by ANSWER_KEYS.
+    """
+    for key in ANSWER_KEYS:
+        answer = answers.get(key)
+        if answer is None:
+            return "missing answer to " + key
+        if not isinstance(answer, str):
+            return "invalid " + key + " " + repr(answer) + " (" + type(answer).__name__ \
+                + ", expected a string)"
+    for key, is_valid in _CHECKS:
+        if not is_valid(answers[key]):
+            return "invalid " + key + " " + answers[key]
+    return None
+
+
+def from_json(record):
+    """(dict) Return a record of answers decoded from JSON, with whole number
+    answers such as 2 in place of "2" turned into strings.
+
+    Parameters:
+        record (dict): A user's answers, keyed by ANSWER_KEYS.
+    """
+    return {key: str(value) if isinstance(value, int) and not isinstance(value, bool) else value
+            for key, value in record.items()}
+
+
+def validate_many(records):
+    """Check each record of answers in turn, without prompting.
+
+    Parameters:
+        records (iter<dict<str, str>>): Users' answers, keyed by ANSWER_KEYS.
+
+    Yield:
+        (str | None): The result of validate for each record.
+    """
+    for answers in records:
+        yield validate(answers)
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the questionnaire for Travel Inspiration",
+          "and is not meant to be executed on its own.")
@@ -0,0 +1,525 @@
+"""
+Recommendation engine for Travel Inspiration.
+
+Scores preference profiles against the columnar Destinations catalog
+with matrix operations instead of a loop over Destination objects.
+"""
+
+import heapq
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from destinations import (CLIMATES, CONTINENTS, CRIMES, INTEREST_KEYS,
+                          SEASON_KEYS, best_season_columns, interest_weights,
+                          season_extremes, season_mask)
+from indexes import PAIR_BASE
+from profiling import phase
+
+
+# Largest number of profile x destination scores held in memory at once.
+BLOCK_CELLS = 1 << 22
+
+
+class Profile:
+    """A validated set of answers to the travel questionnaire."""
+    def __init__(self, continents, cost, crime, kids, seasons, climate, interests):
+        """
+        Parameters:
+            continents (list<str>): Names of the continents to travel to.
+            cost (str): Most expensive cost level, "$", "$$" or "$$$".
+            crime (str): Highest acceptable crime level, e.g. "average".
+            kids (bool): True if travelling with children.
+            seasons (list<str>): Names of the seasons to travel in.
+            climate (str): Name of the preferred climate.
+            interests (dict<str, int> | list<int>): Weight of each interest,
+                either keyed by interest name or in INTEREST_KEYS order.
+        """
+        self._continents = tuple(continents)
+        self._cost = cost
+        self._crime = crime
+        self._kids = kids
+        self._seasons = tuple(seasons)
+        self._climate = climate
+        self._interests = tuple(interest_weights(interests).tolist())
+
+    @classmethod
+    def from_answers(cls, continent, cost, crime, children, season, climate, interests):
+        """(Profile) Build a profile from the raw, already validated answers.
+
+        Parameters:
+            continent (str): Continent menu choices, e.g. "1, 3,4".
+            cost (str): Cost answer, e.g. "$$".
+            crime (str): Crime menu choice, "1" to "3".
+            children (str): "1" if travelling with children, otherwise "2".
+            season (str): Season menu choices, e.g. "1,3".
+            climate (str): Climate menu choice, "1" to "5".
+            interests (dict<str, str>): Answer to each interest question,
+                keyed by interest name.
+        """
+        return cls([CONTINENTS[int(choice) - 1] for choice in continent.split(",")],
+                   cost,
+                   CRIMES[int(crime) - 1],
+                   children == "1",
+                   [SEASON_KEYS[int(choice) - 1] for choice in season.split(",")],
+                   CLIMATES[int(climate) - 1],
+                   {key: int(interests[key]) for key in INTEREST_KEYS})
+
+    def get_continents(self):
+        """(tuple<str>) Return the continents to travel to."""
+        return self._continents
+
+    def get_cost(self):
+        """(str) Return the most expensive acceptable cost level."""
+        return self._cost
+
+    def get_crime(self):
+        """(str) Return the highest acceptable crime level."""
+        return self._crime
+
+    def has_kids(self):
+        """(bool) Return if travelling with children."""
+        return self._kids
+
+    def get_seasons(self):
+        """(tuple<str>) Return the seasons to travel in."""
+        return self._seasons
+
+    def get_climate(self):
+        """(str) Return the preferred climate."""
+        return self._climate
+
+    def get_interests(self):
+        """(tuple<int>) Return the interest weights in INTEREST_KEYS order."""
+        return self._interests
+
+    def get_key(self):
+        """(tuple) Return a key that is equal for profiles with the same recommendations.
+
+        Continents and seasons are deduplicated and sorted, so "1,2,2,3"
+        and "3,1,2" give the same key.
+        """
+        return (tuple(sorted(set(self._continents))), self._cost, self._crime,
+                self._kids, tuple(sorted(set(self._seasons), key=SEASON_KEYS.index)),
+                self._climate, self._interests)
+
+    def canonical(self):
+        """(Profile) Return the profile with its continents and seasons as in get_key."""
+        continents, cost, crime, kids, seasons, climate, interests = self.get_key()
+        return Profile(continents, cost, crime, kids, seasons, climate, interests)
+
+
+def _code(label, labels):
+    """(int) Return the code of label in labels, or -1 if it is not there."""
+    try:
+        return labels.index(label)
+    except ValueError:
+        return -1
+
+
+def _encode_profiles(destinations, profiles):
+    """Encode profiles as arrays lined up with the destination columns.
+
+    Return:
+        (tuple<ndarray>): Interest weights (P x 7), allowed continents
+            (P x continent codes), cost codes, crime codes, kids flags,
+            climate codes and season_mask of the seasons.
+    """
+    continent_labels = destinations.get_labels('continent')
+    cost_labels = destinations.get_labels('cost')
+    crime_labels = destinations.get_labels('crime')
+    climate_labels = destinations.get_labels('climate')
+
+    count = len(profiles)
+    weights = np.empty((count, len(INTEREST_KEYS)), dtype=np.int64)
+    continents = np.zeros((count, len(continent_labels)), dtype=bool)
+    costs = np.empty(count, dtype=np.int8)
+    crimes = np.empty(count, dtype=np.int8)
+    kids = np.empty(count, dtype=bool)
+    climates = np.empty(count, dtype=np.int8)
+    seasons = np.empty(count, dtype=np.int64)
+
+    for row, profile in enumerate(profiles):
+        weights[row] = profile.get_interests()
+        for continent in profile.get_continents():
+            code = _code(continent, continent_labels)
+            if code >= 0:
+                continents[row, code] = True
+        costs[row] = _code(profile.get_cost(), cost_labels)
+        crimes[row] = _code(profile.get_crime(), crime_labels)
+        kids[row] = profile.has_kids()
+        climates[row] = _code(profile.get_climate(), climate_labels)
+        seasons[row] = season_mask(profile.get_seasons())
+
+    return weights, continents, costs, crimes, kids, climates, seasons
+
+
+def _best_rows(destinations, profiles):
+    """Find the best scoring destination row for each profile.
+
+    Return:
+        (tuple<ndarray>): Row of the best destination for each profile,
+            or -1 if no destination meets its constraints, and its score.
+    """
+    # Every row is scored, so removed destinations must be gone first
+    destinations.compact()
+    encoded = _encode_profiles(destinations, profiles)
+    interests = destinations.get_interests().T.astype(np.int64)
+    factors = destinations.get_season_factors()
+    count = len(destinations)
+    # The largest and smallest factor of each set of seasons in the batch
+    extremes = {mask: season_extremes(factors, mask) for mask in set(encoded[-1].tolist())}
+
+    best_rows = np.full(len(profiles), -1, dtype=np.int64)
+    best_scores = np.full(len(profiles), -np.inf)
+    if count == 0:
+        return best_rows, best_scores
+
+    block = max(1, BLOCK_CELLS // count)
+    for start in range(0, len(profiles), block):
+        stop = min(start + block, len(profiles))
+        weights, continents, costs, crimes, kids, climates, seasons = \
+            (column[start:stop] for column in encoded)
+
+        with phase('score'):
+            # Profiles x destinations matrix of the weighted interest sums
+            interest_scores = weights @ interests
+
+            # One season per profile and destination, whatever the number of seasons
+            largest = np.stack([extremes[mask][0] for mask in seasons.tolist()])
+            smallest = np.stack([extremes[mask][1] for mask in seasons.tolist()])
+            columns = best_season_columns(interest_scores, largest, smallest,
+                                          seasons[:, np.newaxis])
+            scores = np.take_along_axis(factors.T, columns, axis=0) * interest_scores
+
+        with phase('filter'):
+            # Hard constraints as a profiles x destinations mask
+            mask = continents[:, destinations.get_continents()]
+            mask &= destinations.get_costs() <= costs[:, np.newaxis]
+            mask &= destinations.get_crimes() <= crimes[:, np.newaxis]
+            mask &= destinations.get_kids() | ~kids[:, np.newaxis]
+            mask &= destinations.get_climates() == climates[:, np.newaxis]
+            scores[~mask] = -np.inf
+
+        # argmax picks the first of equal scores, so ties go to the
+        # destination listed first, like the loop in travel.main
+        rows = scores.argmax(axis=1)
+        top = scores[np.arange(stop - start), rows]
+        found = top > -np.inf
+        best_rows[start:stop] = np.where(found, rows, -1)
+        best_scores[start:stop] = top
+
+    return best_rows, best_scores
+
+
+def recommend_one(destinations, profile):
+    """(str | None) Return the best destination name for a single profile.
+
+    Only the destinations the catalog's ConstraintIndex allows are scored.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from.
+        profile (Profile): Validated questionnaire answers.
+
+    Return:
+        (str | None): Name of the best destination, or None if no
+            destination meets the profile's constraints.
+    """
+    rows = destinations.get_index().candidates(profile)
+    if len(rows) == 0:
+        return None
+    scores, _ = destinations.score_best(profile.get_interests(), profile.get_seasons(), rows)
+    return destinations.get_name(rows[scores.argmax()])
+
+
+def _top_of(destinations, rows, scores, seasons, k):
+    """(list<tuple<int, str, float>>) Return the k best of the scored rows, see top_rows."""
+    # Only scores at least as good as the k-th best can be in the result,
+    # so the heap is fed the few of those instead of every candidate
+    if k < len(scores):
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        contenders = np.flatnonzero(scores >= threshold)
+    else:
+        contenders = np.arange(len(scores))
+
+    best = heapq.nsmallest(k, contenders.tolist(),
+                           key=lambda i: (-scores[i], destinations.get_name(rows[i])))
+    return [(int(rows[i]), SEASON_KEYS[seasons[i]], float(scores[i]))
+            for i in best]
+
+
+def top_rows(destinations, profile, k=10):
+    """(list<tuple<int, str, float>>) Return the rows of the k best destinations for a profile.
+
+    Like recommend, but each result is the destination's row in the
+    catalog instead of a Destination object.
+    """
+    rows = destinations.get_index().candidates(profile)
+    if k < 1 or len(rows) == 0:
+        return []
+    scores, seasons = destinations.score_best(profile.get_interests(), profile.get_seasons(), rows)
+    return _top_of(destinations, rows, scores, seasons, k)
+
+
+def top_rows_between(destinations, profile, start, stop, k=10):
+    """(list<tuple<int, str, float>>) Return the rows of the k best destinations
+    for a profile among rows start to stop of the catalog.
+
+    The same as top_rows on those rows, but the rows are checked straight
+    from the columns, so the catalog's index is not built. Suits a catalog
+    scored a slice at a time, such as a SharedCatalog grouped by continent.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from, with no removed rows.
+        profile (Profile): Validated questionnaire answers.
+        start (int): First row to consider.
+        stop (int): Row after the last to consider.
+        k (int): Largest number of destinations to return.
+    """
+    _, continents, costs, crimes, kids, climates, _ = \
+        (column[0] for column in _encode_profiles(destinations, [profile]))
+    span = slice(start, stop)
+    allowed = continents[destinations.get_continents()[span]]
+    allowed &= destinations.get_costs()[span] <= costs
+    allowed &= destinations.get_crimes()[span] <= crimes
+    allowed &= destinations.get_climates()[span] == climates
+    if kids:
+        allowed &= destinations.get_kids()[span]
+    rows = np.flatnonzero(allowed) + start
+    if k < 1 or len(rows) == 0:
+        return []
+
+    scores, seasons = destinations.score_best(profile.get_interests(), profile.get_seasons(), rows)
+    return _top_of(destinations, rows, scores, seasons, k)
+
+
+def recommend(destinations, profile, k=10):
+    """(list<tuple<Destination, str, float>>) Return the k best destinations for a profile.
+
+    Each destination appears once, with the season it scores best in
+    (the first in SEASON_KEYS order if it scores the same in several).
+    Destinations with equal scores are ranked by name, so the result does
+    not depend on the order of the catalog.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from.
+        profile (Profile): Validated questionnaire answers.
+        k (int): Largest number of destinations to return.
+
+    Return:
+        (list<tuple<Destination, str, float>>): The destination, its best
+            season and its score, best first.
+    """
+    return [(destinations.get_destination(row), season, score)
+            for row, season, score in top_rows(destinations, profile, k)]
+
+
+def recommend_skyline(destinations, profile):
+    """(list<tuple<Destination, str, float>>) Return the skyline of the destinations a profile allows.
+
+    These are the allowed destinations that no other allowed destination
+    beats on cost, crime and score at once, see Destinations.skyline. The
+    cheapest and safest choices are kept next to the best scoring one.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from.
+        profile (Profile): Validated questionnaire answers.
+
+    Return:
+        (list<tuple<Destination, str, float>>): The destination, its best
+            season and its score, best scoring first.
+    """
+    rows = destinations.get_index().candidates(profile)
+    if len(rows) == 0:
+        return []
+    rows = destinations.skyline(profile.get_interests(), profile.get_seasons(), rows)
+    scores, seasons = destinations.score_best(profile.get_interests(), profile.get_seasons(), rows)
+    return [(destinations.get_destination(row), SEASON_KEYS[season], score)
+            for row, season, score in zip(rows.tolist(), seasons.tolist(), scores.tolist())]
+
+
+def recommend_pruned(destinations, profile):
+    """Return the best destination for a profile, skipping buckets that cannot win.
+
+    The profile's (continent, climate) buckets are searched from the highest
+    upper bound on their scores down, and a bucket is skipped once its
+    bound is below the best score found. The result is the same as
+    recommend_one.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from.
+        profile (Profile): Validated questionnaire answers.
+
+    Return:
+        (tuple<str | None, dict<str, int>>): Name of the best destination, or
+            None if no destination meets the profile's constraints, and the
+            number of buckets and destinations searched and pruned.
+    """
+    index = destinations.get_index()
+    bounds = destinations.get_bounds()
+    stats = {'buckets': 0, 'pruned_buckets': 0, 'destinations': 0, 'pruned_destinations': 0}
+
+    codes = {column: [destinations.get_labels(column).index(label) for label in labels
+                      if label in destinations.get_labels(column)]
+             for column, labels in (('continent', set(profile.get_continents())),
+                                    ('climate', [profile.get_climate()]),
+                                    ('cost', [profile.get_cost()]),
+                                    ('crime', [profile.get_crime()]))}
+    if not all(codes.values()):
+        return None, stats
+    climate, cost, crime = codes['climate'][0], codes['cost'][0], codes['crime'][0]
+
+    keys = [continent * PAIR_BASE + climate for continent in codes['continent']
+            if bounds.has_bucket(continent * PAIR_BASE + climate)]
+    if not keys:
+        return None, stats
+    weights = interest_weights(profile.get_interests())
+    columns = [SEASON_KEYS.index(season) for season in set(profile.get_seasons())]
+    upper_bounds = bounds.upper_bounds(keys, weights, columns)
+
+    best_row = -1
+    best_score = -np.inf
+    for bucket in np.argsort(-upper_bounds, kind='stable').tolist():
+        rows = index.pair_rows(keys[bucket] // PAIR_BASE, climate)
+        stats['buckets'] += 1
+        # A bucket whose bound equals the best may still hold an earlier row that ties
+        if upper_bounds[bucket] < best_score:
+            stats['pruned_buckets'] += 1
+            stats['pruned_destinations'] += len(rows)
+            continue
+        stats['destinations'] += len(rows)
+
+        keep = (destinations.get_costs()[rows] <= cost) & (destinations.get_crimes()[rows] <= crime)
+        if profile.has_kids():
+            keep &= destinations.get_kids()[rows]
+        rows = rows[keep]
+        if len(rows) == 0:
+            continue
+        scores, _ = destinations.score_best(weights, profile.get_seasons(), rows)
+        top = scores.argmax()
+        if scores[top] > best_score or (scores[top] == best_score and rows[top] < best_row):
+            best_row = int(rows[top])
+            best_score = scores[top]
+
+    name = destinations.get_name(best_row) if best_row >= 0 else None
+    return name, stats
+
+
+def recommend_batch(destinations, profiles):
+    """(list<str | None>) Return the best destination name for each profile.
+
+    A destination is only considered for a profile if it is on one of the
+    profile's continents, no more expensive and no less safe than allowed,
+    kid friendly if travelling with children and in the preferred climate.
+    Its score is the best over the profile's seasons of the season factor
+    times the weighted interest sum.
+
+    Parameters:
+        destinations (Destinations): Catalog to recommend from.
+        profiles (list<Profile>): Validated questionnaire answers.
+
+    Return:
+        (list<str | None>): Name of the best destination for each profile,
+            or None if no destination meets its constraints.
+    """
+    names = destinations.get_names()
+    rows, _ = _best_rows(destinations, list(profiles))
+    return [names[row] if row >= 0 else None for row in rows.tolist()]
+
+
+def recommend_stream(chunks, profile):
+    """Keep a running best destination over catalog chunks as they are read.
+
+    Parameters:
+        chunks (iter<Destinations>): Consecutive parts of one catalog,
+            such as those from Destinations.iter_file.
+        profile (Profile): Validated questionnaire answers.
+
+    Yield:
+        (tuple<str | None, float>): Name and score of the best destination
+            seen so far after each chunk, (None, -inf) until one is found.
+    """
+    best_name = None
+    best_score = -np.inf
+    for chunk in chunks:
+        rows, scores = _best_rows(chunk, [profile])
+        # Strictly greater keeps the earlier destination on ties
+        if rows[0] >= 0 and scores[0] > best_score:
+            best_name = chunk.get_names()[rows[0]]
+            best_score = float(scores[0])
+        yield best_name, best_score
+
+
+class RecommendationCache:
+    """Least recently used cache of recommendations, keyed by Profile.get_key.
+
+    Results are computed from the canonical profile, so every profile with
+    the same key gets the same answer. The cache empties itself when the
+    catalog's version changes, e.g. after Destinations.reload.
+    """
+    def __init__(self, destinations, maxsize=65536, ttl=None, clock=time.monotonic):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to recommend from.
+            maxsize (int): Largest number of results kept.
+            ttl (float): Seconds a result is kept for, or None to keep it
+                until it is evicted or the catalog changes.
+            clock (callable): Returns the current time in seconds.
+        """
+        self._destinations = destinations
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._clock = clock
+        self._results = OrderedDict()
+        self._version = destinations.get_version()
+        self._hits = 0
+        self._misses = 0
+
+    def clear(self):
+        """Forget every cached result."""
+        self._results.clear()
+        self._version = self._destinations.get_version()
+
+    def get_stats(self):
+        """(dict<str, int>) Return the number of hits, misses and cached results."""
+        return {'hits': self._hits, 'misses': self._misses, 'size': len(self._results)}
+
+    def _lookup(self, key, compute):
+        """Return the cached result for key, calling compute() on a miss."""
+        if self._destinations.get_version() != self._version:
+            self.clear()
+
+        now = self._clock()
+        entry = self._results.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > now):
+            self._results.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+        self._misses += 1
+        result = compute()
+        expires = None if self._ttl is None else now + self._ttl
+        self._results[key] = (expires, result)
+        self._results.move_to_end(key)
+        while len(self._results) > self._maxsize:
+            self._results.popitem(last=False)
+        return result
+
+    def recommend_one(self, profile):
+        """(str | None) Return recommend_one for the profile, from the cache when possible."""
+        return self._lookup(('one', profile.get_key()),
+                            lambda: recommend_one(self._destinations, profile.canonical()))
+
+    def recommend(self, profile, k=10):
+        """(list<tuple<Destination, str, float>>) Return recommend for the profile,
+        from the cache when possible.
+        """
+        return self._lookup(('top', k, profile.get_key()),
+                            lambda: recommend(self._destinations, profile.canonical(), k))
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the recommendation engine for Travel Inspiration",
+          "and is not meant to be executed on its own.")
@@ -0,0 +1,165 @@
+"""
+Long running recommendation service for Travel Inspiration.
+
+Loads the destination database once and answers HTTP requests on a local
+TCP port or Unix socket:
+
+    POST /recommend    body: the answers to the questionnaire as a JSON
+                       object keyed by questionnaire.ANSWER_KEYS ("name" may be
+                       left out), replies {"destination": name or null}
+    GET /health        replies {"destinations": size of the catalog,
+                                "cache": recommendation cache statistics}
+"""
+
+import argparse
+import asyncio
+import json
+
+from destinations import Destinations
+from questionnaire import INTEREST_ANSWER_KEYS, from_json, validate
+from recommender import Profile, RecommendationCache
+
+
+# Largest request body accepted, in bytes
+MAX_BODY = 65536
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large'}
+
+
+class RecommendationService:
+    """Answers recommendation requests from a catalog loaded once."""
+    def __init__(self, destinations):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to recommend from.
+        """
+        self._destinations = destinations
+        self._cache = RecommendationCache(destinations)
+        # Build the index now rather than in the first request
+        destinations.get_index()
+
+    def handle(self, method, path, body):
+        """(tuple<int, dict>) Return the status and JSON reply to a request.
+
+        Parameters:
+            method (str): HTTP method, e.g. "POST".
+            path (str): Request path, e.g. "/recommend".
+            body (bytes): Request body.
+        """
+        if path == '/health':
+            return 200, {'destinations': len(self._destinations),
+                         'cache': self._cache.get_stats()}
+        if path != '/recommend':
+            return 404, {'error': 'unknown path ' + path}
+        if method != 'POST':
+            return 405, {'error': 'use POST'}
+
+        try:
+            answers = json.loads(body)
+        except ValueError:
+            return 400, {'error': 'body is not JSON'}
+        if not isinstance(answers, dict):
+            return 400, {'error': 'body is not a JSON object'}
+        answers = from_json(answers)
+        answers.setdefault('name', '')
+        error = validate(answers)
+        if error is not None:
+            return 400, {'error': error}
+
+        profile = Profile.from_answers(answers['continent'], answers['cost'], answers['crime'],
+                                       answers['children'], answers['season'], answers['climate'],
+                                       {key: answers[key] for key in INTEREST_ANSWER_KEYS})
+        return 200, {'destination': self._cache.recommend_one(profile)}
+
+    async def serve_connection(self, reader, writer):
+        """Answer the requests sent on one connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._reply(writer, 400, {'error': 'bad request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' \
+                    and version == 'HTTP/1.1'
+                try:
+                    length = int(headers.get('content-length', '0') or 0)
+                except ValueError:
+                    length = -1
+                if length < 0:
+                    await self._reply(writer, 400, {'error': 'bad content length'}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._reply(writer, 413, {'error': 'body too large'}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                status, reply = self.handle(method, path.split('?')[0], body)
+                await self._reply(writer, status, reply, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _reply(writer, status, reply, keep_alive):
+        """Send a JSON reply."""
+        body = json.dumps(reply).encode()
+        writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\n'
+                     'Content-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                         status, REASONS[status], len(body),
+                         'keep-alive' if keep_alive else 'close').encode() + body)
+        await writer.drain()
+
+
+async def serve(service, host='127.0.0.1', port=8000, unix_path=None):
+    """Run the service until cancelled.
+
+    Parameters:
+        service (RecommendationService): Service answering the requests.
+        host (str): Address to listen on.
+        port (int): TCP port to listen on.
+        unix_path (str): Listen on this Unix socket instead of a TCP port.
+    """
+    if unix_path is not None:
+        server = await asyncio.start_unix_server(service.serve_connection, unix_path)
+    else:
+        server = await asyncio.start_server(service.serve_connection, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    """Serve recommendations over HTTP until interrupted."""
+    parser = argparse.ArgumentParser(description="Serve Travel Inspiration recommendations over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead")
+    parser.add_argument('--destinations', default='destinations.csv',
+                        help="destination database (default: destinations.csv)")
+    options = parser.parse_args()
+
+    service = RecommendationService(Destinations(options.destinations, cache=True))
+    try:
+        asyncio.run(serve(service, options.host, options.port, options.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
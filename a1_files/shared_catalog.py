@@ -0,0 +1,203 @@
+"""
+Shared memory catalog for Travel Inspiration.
+
+Publishes a parsed Destinations catalog into one block of shared memory,
+which worker processes attach to instead of loading or receiving their
+own copy. The attached catalog's columns are read-only views of the
+shared block, so memory stays flat however many workers attach.
+
+    with SharedCatalog.publish(destinations) as shared:
+        handle = shared.get_handle()    # small and picklable
+        ... send handle to the workers ...
+
+    # In a worker
+    destinations = SharedCatalog.attach(handle).get_destinations()
+"""
+
+import sys
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from destinations import Destinations
+from names import NameTable
+
+
+# Arrays stored in the block, besides the name table
+ARRAY_COLUMNS = ('continent', 'climate', 'cost', 'crime', 'kids', 'interests', 'season_factors')
+
+# Each array starts at a multiple of this many bytes
+ALIGNMENT = 64
+
+# Mappings closed while their columns were still in use, kept open until exit
+_still_mapped = []
+
+
+def _open_untracked(name):
+    """(SharedMemory) Attach to a shared memory block without the resource tracker
+    unlinking it when this process ends.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before 3.13 every attached block is tracked, so leave it out by hand
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedCatalog:
+    """A Destinations catalog held in a block of shared memory.
+
+    The process that publishes the catalog owns the block and removes it
+    when closed. Processes that attach only close their own mapping.
+    """
+    def __init__(self, memory, handle, owner):
+        """Use publish or attach instead.
+
+        Parameters:
+            memory (SharedMemory): Block holding the catalog.
+            handle (dict): Layout of the block, see get_handle.
+            owner (bool): True if this process created the block.
+        """
+        self._memory = memory
+        self._handle = handle
+        self._owner = owner
+        self._destinations = None
+
+    @classmethod
+    def publish(cls, destinations, group_by=None):
+        """(SharedCatalog) Copy a catalog into a new block of shared memory.
+
+        With group_by, the rows are stored grouped by the codes of that
+        column, keeping their order within each group, so that a worker can
+        read one group as a slice of the columns, see get_group.
+
+        Parameters:
+            destinations (Destinations): Catalog to publish.
+            group_by (str): Categorical column to group the rows by, such as 'continent'.
+        """
+        columns = destinations.get_columns()
+        names = columns['name']
+        order = None
+        groups = {}
+        if group_by is not None:
+            codes = np.asarray(columns[group_by])
+            order = np.argsort(codes, kind='stable')
+            sizes = np.bincount(codes, minlength=len(columns['labels'][group_by]))
+            stops = np.cumsum(sizes)
+            groups = {code: (int(stops[code] - sizes[code]), int(stops[code]))
+                      for code in np.flatnonzero(sizes).tolist()}
+            names = [names[row] for row in order.tolist()]
+
+        arrays = {key: columns[key] for key in ARRAY_COLUMNS}
+        arrays['name_data'], arrays['name_offsets'] = NameTable.encode(names)
+        if order is not None:
+            arrays['rows'] = order
+
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            layout[key] = (size, array.dtype.str, array.shape)
+            size += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        handle = {'memory': memory.name, 'layout': layout, 'groups': groups,
+                  'labels': {column: list(labels) for column, labels in columns['labels'].items()}}
+        shared = cls(memory, handle, True)
+        for key, array in arrays.items():
+            if order is not None and key in ARRAY_COLUMNS:
+                # Written in group order straight into the block, without a copy
+                np.take(array, order, axis=0, out=shared._view(key), mode='clip')
+            else:
+                shared._view(key)[...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, handle):
+        """(SharedCatalog) Attach to a catalog published by another process.
+
+        Parameters:
+            handle (dict): The published catalog's get_handle.
+        """
+        return cls(_open_untracked(handle['memory']), handle, False)
+
+    def _view(self, key):
+        """(ndarray) Return the array stored in the block under the key."""
+        offset, dtype, shape = self._handle['layout'][key]
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self._memory.buf, offset=offset)
+
+    def get_handle(self):
+        """(dict) Return the picklable description that attach needs to find the catalog."""
+        return self._handle
+
+    def get_group(self, code):
+        """(tuple<int, int>) Return the start and stop rows of a group of the catalog,
+        or (0, 0) if it has no rows. See publish.
+
+        Parameters:
+            code (int): Code of the group in the group_by column.
+        """
+        return tuple(self._handle['groups'].get(code, (0, 0)))
+
+    def get_groups(self):
+        """(list<int>) Return the codes of the groups with rows, in order. See publish."""
+        return sorted(self._handle['groups'])
+
+    def get_original_rows(self):
+        """(ndarray) Return the row each row of the block had in the published catalog.
+
+        Rows are only moved when the catalog is published with group_by.
+        """
+        if 'rows' not in self._handle['layout']:
+            return np.arange(len(self.get_destinations()), dtype=np.int64)
+        rows = self._view('rows')
+        rows.setflags(write=False)
+        return rows
+
+    def get_destinations(self):
+        """(Destinations) Return the catalog, its columns read-only views of the block.
+
+        Changing the catalog with apply_delta copies the columns it changes
+        out of the block first, so the block itself never changes.
+        """
+        if self._destinations is None:
+            columns = {key: self._view(key) for key in ARRAY_COLUMNS}
+            for array in columns.values():
+                array.setflags(write=False)
+            columns['name'] = NameTable(self._view('name_data'), self._view('name_offsets'))
+            columns['labels'] = self._handle['labels']
+            self._destinations = Destinations.from_columns(columns)
+        return self._destinations
+
+    def close(self):
+        """Close this process's mapping of the block and, if this process
+        published it, remove the block.
+
+        The mapping stays open while other references to the catalog's
+        columns remain, and closes when the process ends.
+        """
+        if self._memory is None:
+            return
+        self._destinations = None
+        try:
+            self._memory.close()
+        except BufferError:
+            _still_mapped.append(self._memory)
+        if self._owner:
+            self._memory.unlink()
+        self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the shared memory catalog for Travel Inspiration",
+          "and is not meant to be executed on its own.")
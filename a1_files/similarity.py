@@ -0,0 +1,170 @@
+"""
+Similar destination lookup for Travel Inspiration.
+
+Finds the destinations nearest to a given one in the space of their seven
+interest scores and four season factors, for "if you liked X" suggestions.
+A KD-tree over the catalog answers a lookup by visiting the few leaves
+near the destination instead of measuring the distance to every other
+one.
+"""
+
+import heapq
+
+import numpy as np
+
+
+# Largest number of destinations held in a leaf of the tree
+LEAF_SIZE = 32
+
+
+def _squared_distances(points, point):
+    """(ndarray) Return the squared distance from each of the points to the point."""
+    return ((points - point) ** 2).sum(axis=1)
+
+
+class SimilarityIndex:
+    """KD-tree over the interest scores and season factors of the destinations.
+
+    Each node of the tree holds a run of the destinations in the tree's
+    order and the bounding box of their points. A node is split at the
+    median of the dimension its points are most spread along, until at
+    most LEAF_SIZE destinations are left in it. A lookup visits the nodes
+    nearest first and skips each node whose box is further away than the
+    k-th nearest destination found so far.
+
+    The tree is rebuilt on the next lookup after the catalog changes.
+    """
+    def __init__(self, destinations, leaf_size=LEAF_SIZE):
+        """
+        Parameters:
+            destinations (Destinations): Catalog to look up destinations in.
+            leaf_size (int): Largest number of destinations in a leaf.
+        """
+        self._destinations = destinations
+        self._leaf_size = leaf_size
+        self._version = None
+
+    def _points(self):
+        """(ndarray) Return the point of each destination: its interests then its season factors."""
+        destinations = self._destinations
+        return np.hstack([destinations.get_interests().astype(np.float64),
+                          destinations.get_season_factors()])
+
+    def _build(self):
+        """Build the tree over the current catalog, compacting it first."""
+        self._destinations.compact()
+        points = self._points()
+        order = np.arange(len(points), dtype=np.int64)
+        # For each node: its run of order, its children (-1 for a leaf) and its box
+        starts = []
+        stops = []
+        children = []
+        lows = []
+        highs = []
+
+        stack = [(0, len(points), None, None)]
+        while stack:
+            start, stop, parent, side = stack.pop()
+            node = len(starts)
+            if parent is not None:
+                children[parent][side] = node
+            run = points[order[start:stop]]
+            starts.append(start)
+            stops.append(stop)
+            children.append([-1, -1])
+            lows.append(run.min(axis=0) if len(run) else np.zeros(points.shape[1]))
+            highs.append(run.max(axis=0) if len(run) else np.zeros(points.shape[1]))
+            if stop - start <= self._leaf_size:
+                continue
+
+            dimension = int((highs[node] - lows[node]).argmax())
+            middle = (stop - start) // 2
+            split = np.argpartition(run[:, dimension], middle)
+            order[start:stop] = order[start:stop][split]
+            stack.append((start + middle, stop, node, 1))
+            stack.append((start, start + middle, node, 0))
+
+        self._tree_points = points
+        self._order = order
+        self._starts = starts
+        self._stops = stops
+        self._children = children
+        self._lows = np.array(lows)
+        self._highs = np.array(highs)
+        self._version = self._destinations.get_version()
+
+    def _nearest(self, point, k, exclude):
+        """(list<tuple<float, int>>) Return the squared distance and row of the
+        k destinations nearest the point, searching the tree.
+        """
+        if self._version != self._destinations.get_version():
+            self._build()
+        points = self._tree_points
+        # Max heap of the k nearest found, as (-distance, -row)
+        nearest = []
+        nodes = [(0.0, 0)]
+        while nodes:
+            box_distance, node = heapq.heappop(nodes)
+            # Nodes come nearest first, so no later node can be nearer either
+            if len(nearest) == k and box_distance > -nearest[0][0]:
+                break
+            left, right = self._children[node]
+            if left < 0:
+                rows = self._order[self._starts[node]:self._stops[node]]
+                for row, distance in zip(rows.tolist(),
+                                         _squared_distances(points[rows], point).tolist()):
+                    if row == exclude:
+                        continue
+                    if len(nearest) < k:
+                        heapq.heappush(nearest, (-distance, -row))
+                    elif (-distance, -row) > nearest[0]:
+                        heapq.heapreplace(nearest, (-distance, -row))
+                continue
+            for child in (left, right):
+                gap = np.maximum(self._lows[child] - point, 0) + np.maximum(point - self._highs[child], 0)
+                heapq.heappush(nodes, (float(gap @ gap), child))
+        return sorted((-distance, -row) for distance, row in nearest)
+
+    def _nearest_brute_force(self, point, k, exclude):
+        """(list<tuple<float, int>>) Return the squared distance and row of the
+        k destinations nearest the point, measuring every destination.
+        """
+        distances = _squared_distances(self._points(), point)
+        rows = np.arange(len(distances))
+        keep = rows != exclude
+        rows, distances = rows[keep], distances[keep]
+        order = np.lexsort((rows, distances))[:k]
+        return list(zip(distances[order].tolist(), rows[order].tolist()))
+
+    def similar_to(self, name, k=10, brute_force=False):
+        """(list<tuple<Destination, float>>) Return the k destinations most like the named one.
+
+        Destinations at the same distance are given in catalog order.
+
+        Parameters:
+            name (str): Name of the destination to match.
+            k (int): Largest number of destinations to return.
+            brute_force (bool): Measure the distance to every destination
+                instead of searching the tree, to check the tree's result.
+
+        Return:
+            (list<tuple<Destination, float>>): The destinations and their
+                distance from the named one, nearest first.
+        """
+        destinations = self._destinations
+        if self._version != destinations.get_version():
+            self._build()
+        row = destinations.find(name)
+        if k < 1:
+            return []
+        point = np.concatenate([destinations.get_interests()[row].astype(np.float64),
+                                destinations.get_season_factors()[row]])
+        search = self._nearest_brute_force if brute_force else self._nearest
+        return [(destinations.get_destination(other), float(np.sqrt(distance)))
+                for distance, other in search(point, k, row)]
+
+
+# Check if an attempt is made to execute this module and output error message.
+if __name__ == "__main__":
+    print("This module provides the similar destination lookup for Travel Inspiration",
+          "and is not meant to be executed on its own.")
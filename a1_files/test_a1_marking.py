@@ -13,6 +13,7 @@ from pathlib import Path
 from string import punctuation
 
 from destinations import Destinations
+from names import NameMatcher
 from testrunner import OrderedTestCase, TestMaster, RedirectStdIO, skipIfFailed
 
 # So we don't remove $ from output
@@ -20,14 +21,10 @@ punctuation = punctuation.replace('$', '')
 
 TEST_DATA = Path('test_data') / 'marking'
 
-# Compile regex expression "dest_1|dest_2|dest_3|dest_n"
-# Reverse order because some destinations have names that are part other other
-# destinations. Search in reverse to match the longer destination name first.
-DESTINATIONS_PATTERN = re.compile(
-    '|'.join(sorted((fr'{re.escape(d.get_name())}'
-                    for d in Destinations('destinations_long.csv').get_all()), reverse=True) + ['None']),
-    flags=re.MULTILINE | re.IGNORECASE
-)
+# Finds any destination name or "None" in the output, matching the longer
+# name first where one destination's name is part of another's.
+DESTINATIONS_PATTERN = NameMatcher(Destinations('destinations_long.csv').get_names() + ['None'],
+                                   ignore_case=True)
 NEWLINES_PATTERN = re.compile(r'\n+')
 SPACES_PATTERN = re.compile(r'[^\S\n]{2,}')
 
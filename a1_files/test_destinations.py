@@ -0,0 +1,822 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for the columnar destination catalog and the recommenders built on it.
+Run from the a1_files directory with: python -m unittest test_destinations
+"""
+
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+import unittest.mock
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import benchmark
+import catalog_format
+from destinations import (CLIMATES, CONTINENTS, COSTS, CRIMES, Destinations,
+                          INTEREST_KEYS, SEASON_KEYS, read_delta)
+from parallel import ParallelRecommender
+from service import RecommendationService
+from shared_catalog import SharedCatalog
+import profiling
+from names import NameMatcher
+from questionnaire import QUESTIONS, from_json, validate, validate_many
+from similarity import SimilarityIndex
+from travel import batch_main, run_batch
+import warm
+from recommender import (Profile, RecommendationCache, recommend, recommend_batch,
+                         recommend_one, recommend_pruned, recommend_skyline,
+                         recommend_stream, top_rows, top_rows_between)
+
+
+WEIGHTS = {'sports': -5, 'wildlife': 2, 'nature': 3, 'historical': 1,
+           'cuisine': -3, 'adventure': 4, 'beach': -2}
+
+# Valid questionnaire answers, recommended Macau, China
+ANSWERS = dict(name="Dora", continent="1,3,4,7", cost="$$$", crime="3", children="2",
+               season="1, 3", climate="4", sports="-5", wildlife="-2", nature="-4",
+               historical="-1", cuisine="-3", adventure="-4", beach="-2")
+
+
+def temporary_directory(test):
+    """Return a new directory, removed when the test ends."""
+    directory = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, directory)
+    return directory
+
+
+class TestDestinations(unittest.TestCase):
+    def setUp(self):
+        self.destinations = Destinations()
+
+    def test_object_view(self):
+        destinations = self.destinations.get_all()
+        self.assertEqual(len(destinations), 50)
+        albania = destinations[0]
+        self.assertEqual(albania.get_name(), 'Albania')
+        self.assertEqual(albania.get_continent(), 'europe')
+        self.assertEqual(albania.get_cost(), '$$')
+        self.assertEqual(albania.get_crime(), 'average')
+        self.assertFalse(albania.is_kid_friendly())
+        self.assertEqual(albania.get_interest_score('sports'), 4)
+        self.assertEqual(albania.get_season_factor('summer'), 2.92)
+
+    def test_score_best(self):
+        for seasons in (['summer'], ['winter', 'spring'], SEASON_KEYS):
+            scores, columns = self.destinations.score_best(WEIGHTS, seasons)
+            all_scores = self.destinations.score_all(WEIGHTS, SEASON_KEYS)
+            expected = self.destinations.score_all(WEIGHTS, seasons).max(axis=1)
+            self.assertEqual(scores.tolist(), expected.tolist())
+            self.assertEqual(all_scores[range(len(scores)), columns].tolist(), scores.tolist())
+
+    def test_skyline(self):
+        rng = random.Random(0)
+        costs = self.destinations.get_costs()
+        crimes = self.destinations.get_crimes()
+        for _ in range(50):
+            weights = [rng.randint(-5, 5) for _ in INTEREST_KEYS]
+            seasons = rng.sample(SEASON_KEYS, rng.randint(1, 4))
+            scores, _ = self.destinations.score_best(weights, seasons)
+            # Every pair compared, with rounded scores so that some tie
+            scores = np.round(scores, -1)
+            expected = [row for row in range(len(scores)) if not any(
+                costs[other] <= costs[row] and crimes[other] <= crimes[row]
+                and scores[other] >= scores[row]
+                and (costs[other], crimes[other], scores[other]) != (costs[row], crimes[row], scores[row])
+                for other in range(len(scores)))]
+            # A catalog whose score for the first interest is the rounded score
+            interests = np.zeros_like(self.destinations.get_interests())
+            interests[:, 0] = 1
+            rounded = Destinations.from_columns(dict(
+                self.destinations.get_columns(), interests=interests,
+                season_factors=np.tile(scores[:, np.newaxis], (1, len(SEASON_KEYS)))))
+            self.assertEqual(sorted(rounded.skyline([1, 0, 0, 0, 0, 0, 0], seasons).tolist()),
+                             expected)
+
+    def test_iter_file(self):
+        chunks = list(Destinations.iter_file(chunk_size=16))
+        self.assertEqual([len(chunk) for chunk in chunks], [16, 16, 16, 2])
+        self.assertEqual([name for chunk in chunks for name in chunk.get_names()],
+                         self.destinations.get_names())
+
+    def test_score_all_matches_getters(self):
+        scores = self.destinations.score_all(WEIGHTS, SEASON_KEYS)
+        for row, destination in enumerate(self.destinations.get_all()):
+            interest_score = sum(WEIGHTS[key] * destination.get_interest_score(key)
+                                 for key in INTEREST_KEYS)
+            for column, season in enumerate(SEASON_KEYS):
+                self.assertEqual(scores[row, column],
+                                 destination.get_season_factor(season) * interest_score)
+
+    def test_apply_delta(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        added = dict(rows[0], name='Atlantis', continent='oceania', climate='cold')
+        updated = dict(rows[3], continent='asia', kids='True')
+        self.destinations.get_index()
+        self.destinations.get_bounds()
+        self.destinations.apply_delta(adds=[added], updates=[updated],
+                                      removes=[rows[1]['name'], rows[10]['name']])
+
+        expected = Destinations.from_rows(
+            [updated if row is rows[3] else row for row in rows
+             if row not in (rows[1], rows[10])] + [added])
+        # Removed rows are only marked until the catalog is compacted
+        self.assertEqual(len(self.destinations), 49)
+        self.assertEqual(np.flatnonzero(self.destinations.get_removed()).tolist(), [1, 10])
+        self.assertEqual(self.destinations.find('Atlantis'), 50)
+        with self.assertRaises(KeyError):
+            self.destinations.find(rows[1]['name'])
+        for seed in range(200):
+            profile = random_profile(random.Random(seed))
+            self.assertEqual([self.destinations.get_name(row) for row
+                              in self.destinations.get_index().candidates(profile)],
+                             [expected.get_name(row) for row
+                              in expected.get_index().candidates(profile)])
+            self.assertEqual(recommend_pruned(self.destinations, profile)[0],
+                             recommend_one(expected, profile))
+
+        version = self.destinations.get_version()
+        self.assertEqual(self.destinations.get_names(), expected.get_names())
+        self.assertIsNone(self.destinations.get_removed())
+        self.assertNotEqual(self.destinations.get_version(), version)
+        self.assertEqual(self.destinations.find('Atlantis'), 48)
+        for seed in range(200):
+            profile = random_profile(random.Random(seed))
+            self.assertEqual(self.destinations.get_index().candidates(profile).tolist(),
+                             expected.get_index().candidates(profile).tolist())
+        with self.assertRaises(ValueError):
+            self.destinations.apply_delta(adds=[added])
+        with self.assertRaises(KeyError):
+            self.destinations.apply_delta(removes=['Nowhere'])
+
+    def test_apply_delta_matches_rebuild(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        rng = random.Random(4)
+
+        def random_row(name):
+            return dict(rng.choice(rows), name=name, continent=rng.choice(CONTINENTS + ('atlantis',)),
+                        climate=rng.choice(CLIMATES), cost=rng.choice(COSTS),
+                        crime=rng.choice(CRIMES), kids=rng.choice(['True', 'False']))
+
+        current = {row['name']: row for row in rows}
+        self.destinations.get_index()
+        compacted = 0
+        for step in range(40):
+            names = rng.sample(list(current), 6)
+            adds = [random_row('New {}'.format(step * 3 + number)) for number in range(3)]
+            updates = [random_row(name) for name in names[:3]]
+            self.destinations.apply_delta(adds, updates, names[3:])
+            current.update((row['name'], row) for row in updates + adds)
+            for name in names[3:]:
+                del current[name]
+            compacted += self.destinations.get_removed() is None
+
+            expected = Destinations.from_rows(list(current.values()))
+            for seed in range(10):
+                profile = random_profile(random.Random(step * 10 + seed))
+                self.assertEqual(recommend_one(self.destinations, profile),
+                                 recommend_one(expected, profile))
+                self.assertEqual([self.destinations.get_name(row) for row
+                                  in self.destinations.get_index().at_most(1, 1)],
+                                 [expected.get_name(row) for row
+                                  in expected.get_index().at_most(1, 1)])
+        # Removing three rows a step, the catalog was compacted now and then
+        self.assertGreater(compacted, 0)
+        self.assertLess(compacted, 40)
+        self.assertEqual(self.destinations.get_names(), expected.get_names())
+
+    def test_apply_delta_repeated_update(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        self.destinations.get_index()
+        first = dict(rows[3], continent='asia')
+        last = dict(rows[3], continent='europe', climate='cold')
+        self.destinations.apply_delta(updates=[first, last])
+
+        expected = Destinations.from_rows([last if row is rows[3] else row for row in rows])
+        index = self.destinations.get_index()
+        for continent in range(len(expected.get_labels('continent'))):
+            for climate in range(len(expected.get_labels('climate'))):
+                self.assertEqual(index.pair_rows(continent, climate).tolist(),
+                                 expected.get_index().pair_rows(continent, climate).tolist())
+        for seed in range(200):
+            profile = random_profile(random.Random(seed))
+            self.assertEqual(self.destinations.get_index().candidates(profile).tolist(),
+                             expected.get_index().candidates(profile).tolist())
+            names = [destination.get_name() for destination, _, _
+                     in recommend(self.destinations, profile, k=len(rows))]
+            self.assertEqual(len(names), len(set(names)))
+
+    def test_apply_delta_repeated_add(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        added = dict(rows[0], name='Atlantis')
+        with self.assertRaises(ValueError):
+            self.destinations.apply_delta(adds=[added, dict(added, continent='asia')])
+        # Nothing was changed
+        self.assertEqual(len(self.destinations), len(rows))
+        with self.assertRaises(KeyError):
+            self.destinations.find('Atlantis')
+
+    def test_apply_delta_copies_shared_columns(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        updated = dict(rows[3], summer='9.5', beach='-5')
+        columns = self.destinations.get_columns()
+        interests = columns['interests'].copy()
+        factors = columns['season_factors'].copy()
+
+        # Neither the catalog the columns came from nor the columns handed out change
+        copy = Destinations.from_columns(columns)
+        copy.apply_delta(updates=[updated])
+        self.destinations.apply_delta(updates=[updated])
+        self.assertEqual(columns['interests'].tolist(), interests.tolist())
+        self.assertEqual(columns['season_factors'].tolist(), factors.tolist())
+        self.assertEqual(copy.get_destination(3).get_season_factor('summer'), 9.5)
+
+    def test_read_delta(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as delta_file:
+            delta_file.write('op,name,cost,crime,kids,climate,continent,spring,summer,autumn,'
+                             'winter,wildlife,sports,adventure,cuisine,nature,historical,beach\n'
+                             'add,Atlantis,$,low,True,warm,europe,1,1,1,1,5,5,5,5,5,5,5\n'
+                             'remove,Albania,,,,,,,,,,,,,,,,\n')
+        try:
+            adds, updates, removes = read_delta(delta_file.name)
+        finally:
+            os.remove(delta_file.name)
+        self.assertEqual([row['name'] for row in adds], ['Atlantis'])
+        self.assertEqual((updates, removes), ([], ['Albania']))
+        self.destinations.apply_delta(adds, updates, removes)
+        self.assertEqual(self.destinations.get_names()[-1], 'Atlantis')
+        self.assertNotIn('Albania', self.destinations.get_names())
+
+
+class TestSimilarityIndex(unittest.TestCase):
+    def test_similar_to(self):
+        destinations = Destinations()
+        index = SimilarityIndex(destinations, leaf_size=4)
+        for name in destinations.get_names():
+            similar = [(destination.get_name(), distance)
+                       for destination, distance in index.similar_to(name, 5)]
+            self.assertEqual(similar, [(destination.get_name(), distance) for destination, distance
+                                       in index.similar_to(name, 5, brute_force=True)])
+            self.assertNotIn(name, [other for other, _ in similar])
+
+        # The tree follows changes to the catalog
+        destinations.apply_delta(removes=[destinations.get_names()[1]])
+        name = destinations.get_names()[0]
+        self.assertEqual([destination.get_name() for destination, _ in index.similar_to(name, 50)],
+                         [destination.get_name() for destination, _
+                          in index.similar_to(name, 50, brute_force=True)])
+
+
+class TestConstraintIndex(unittest.TestCase):
+    def test_cost_and_crime_ranges(self):
+        # A catalog where few destinations are cheap and safe, so the
+        # cost and crime orders are the most selective
+        columns = Destinations().get_columns()
+        rng = np.random.default_rng(0)
+        size = 40 * len(columns['name'])
+        columns = dict(columns, name=columns['name'] * 40,
+                       **{key: np.tile(columns[key], (40,) + (1,) * (columns[key].ndim - 1))
+                          for key in ('continent', 'climate', 'kids', 'interests', 'season_factors')},
+                       cost=np.where(rng.random(size) < 0.01, 0, 2).astype(np.int8),
+                       crime=rng.integers(0, 3, size).astype(np.int8))
+        destinations = Destinations.from_columns(columns)
+        index = destinations.get_index()
+        for cost in range(3):
+            for crime in range(3):
+                self.assertEqual(index.at_most(cost, crime).tolist(), np.flatnonzero(
+                    (columns['cost'] <= cost) & (columns['crime'] <= crime)).tolist())
+
+        for seed in range(200):
+            profile = random_profile(random.Random(seed))
+            allowed = np.isin(columns['continent'], [CONTINENTS.index(continent)
+                                                     for continent in profile.get_continents()]) \
+                & (columns['climate'] == CLIMATES.index(profile.get_climate())) \
+                & (columns['cost'] <= COSTS.index(profile.get_cost())) \
+                & (columns['crime'] <= CRIMES.index(profile.get_crime())) \
+                & (columns['kids'] | (not profile.has_kids()))
+            self.assertEqual(index.candidates(profile).tolist(), np.flatnonzero(allowed).tolist())
+
+
+class TestNameMatcher(unittest.TestCase):
+    def test_matches_like_regex(self):
+        names = Destinations().get_names() + ['None', 'Par', 'Paris']
+        pattern = re.compile('|'.join(sorted(map(re.escape, names), reverse=True)), re.IGNORECASE)
+        matcher = NameMatcher(names, ignore_case=True)
+        rng = random.Random(0)
+        for _ in range(200):
+            text = ''.join(rng.choice([name, name.upper()]) + rng.choice(['', ' ', '\n', 'Pa', ', '])
+                           for name in rng.sample(names, 10))
+            self.assertEqual(matcher.findall(text), pattern.findall(text))
+            self.assertEqual(matcher.sub('', text), pattern.sub('', text))
+
+    def test_destination_names(self):
+        destinations = Destinations()
+        name = destinations.get_names()[5]
+        self.assertEqual(destinations.get_name_matcher().findall('Go to {}!'.format(name.lower())),
+                         [name.lower()])
+        self.assertEqual(NameMatcher([name]).findall(name.upper()), [])
+
+
+class TestFromFiles(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+
+    def test_from_files(self):
+        with open('destinations.csv') as destination_file:
+            reader = csv.DictReader(destination_file)
+            rows = list(reader)
+        # The last shard repeats a destination and brings in a new continent
+        shards = [rows[:20], rows[20:35], rows[35:] + [dict(rows[3], continent='atlantis'),
+                                                      dict(rows[0], name='Atlantis',
+                                                           continent='atlantis')]]
+        for number, shard in enumerate(shards):
+            with open(os.path.join(self.directory, 'region{}.csv'.format(number)), 'w',
+                      newline='') as shard_file:
+                writer = csv.DictWriter(shard_file, reader.fieldnames)
+                writer.writeheader()
+                writer.writerows(shard)
+
+        expected = Destinations.from_rows(rows + [shards[2][-1]])
+        for workers in (1, 2):
+            destinations = Destinations.from_files(os.path.join(self.directory, 'region*.csv'),
+                                                   workers=workers)
+            self.assertEqual(destinations.get_names(), expected.get_names())
+            for column, values in expected.get_columns().items():
+                if column not in ('name', 'labels'):
+                    self.assertEqual(destinations.get_columns()[column].tolist(), values.tolist())
+            self.assertEqual(destinations.get_destination(50).get_continent(), 'atlantis')
+        self.assertEqual(len(Destinations.from_files([])), 0)
+        with self.assertRaises(FileNotFoundError):
+            Destinations.from_files([os.path.join(self.directory, 'missing*.csv')])
+
+
+class TestCatalogFormats(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+
+    def assertSameColumns(self, columns, expected):
+        self.assertEqual(list(columns['name']), list(expected['name']))
+        self.assertEqual(columns['labels'], expected['labels'])
+        for column, values in expected.items():
+            if column not in ('name', 'labels'):
+                self.assertEqual(columns[column].dtype, values.dtype, column)
+                self.assertEqual(columns[column].tolist(), values.tolist(), column)
+
+    def test_round_trip(self):
+        expected = Destinations().get_columns()
+        for suffix in ('.csv.gz', '.csv.xz', '.tcat', '.tcat.gz', '.tcat.xz'):
+            filename = os.path.join(self.directory, 'destinations' + suffix)
+            Destinations().save(filename)
+            self.assertSameColumns(Destinations(filename).get_columns(), expected)
+            chunks = list(Destinations.iter_file(filename, chunk_size=16))
+            self.assertEqual([len(chunk) for chunk in chunks], [16, 16, 16, 2])
+        with catalog_format.open_file(os.path.join(self.directory, 'destinations.csv.gz')) as csv_file:
+            self.assertEqual(next(csv.reader(csv_file))[:2], ['name', 'cost'])
+
+    def test_columnar_encodings(self):
+        columns = benchmark.generate_catalog(1000, seed=2)
+        columns['labels']['continent'].append('atlantis')
+        columns['continent'][:3] = len(CONTINENTS)
+        filename = os.path.join(self.directory, 'catalog.tcat')
+        catalog_format.write(filename, columns)
+        self.assertSameColumns(catalog_format.read(filename), columns)
+        # Season factors with too many decimal places are kept as float64
+        columns['season_factors'][0, 0] = 1 / 3
+        catalog_format.write(filename, columns)
+        self.assertSameColumns(catalog_format.read(filename), columns)
+
+        empty = Destinations.from_rows([]).get_columns()
+        catalog_format.write(filename, empty)
+        self.assertSameColumns(catalog_format.read(filename), empty)
+        with self.assertRaises(ValueError):
+            catalog_format.read('destinations.csv')
+
+
+class TestBenchmark(unittest.TestCase):
+    def test_generated_catalog(self):
+        filename = os.path.join(temporary_directory(self), 'destinations.csv')
+        benchmark.write_catalog(filename, 500, seed=3, chunk_size=128)
+        loaded = Destinations(filename).get_columns()
+        generated = benchmark.generate_catalog(500, seed=3)
+        self.assertEqual(loaded['name'], generated['name'])
+        for column in ('continent', 'climate', 'cost', 'crime', 'kids', 'interests',
+                       'season_factors'):
+            self.assertEqual(loaded[column].tolist(), generated[column].tolist())
+        self.assertEqual([profile.get_key() for profile in benchmark.generate_profiles(20, 1)],
+                         [profile.get_key() for profile in benchmark.generate_profiles(20, 1)])
+
+    def test_compare(self):
+        baseline = [{'rows': 1000, 'query_p50_ms': 1.0, 'batch_profiles_per_second': 100.0}]
+        self.assertEqual(benchmark.compare(
+            [{'rows': 1000, 'query_p50_ms': 1.1, 'batch_profiles_per_second': 90.0}], baseline, 0.2), [])
+        self.assertEqual(len(benchmark.compare(
+            [{'rows': 1000, 'query_p50_ms': 1.5, 'batch_profiles_per_second': 50.0}], baseline, 0.2)), 2)
+
+
+def _shared_names(handle, rows):
+    """Return the names of the rows of a shared catalog, read in a worker process."""
+    shared = SharedCatalog.attach(handle)
+    try:
+        return [shared.get_destinations().get_names()[row] for row in rows]
+    finally:
+        shared.close()
+
+
+class TestSharedCatalog(unittest.TestCase):
+    def test_publish_and_attach(self):
+        destinations = Destinations()
+        with SharedCatalog.publish(destinations) as shared:
+            attached = SharedCatalog.attach(shared.get_handle())
+            copy = attached.get_destinations()
+            self.assertEqual(list(copy.get_names()), destinations.get_names())
+            for column in ('continent', 'climate', 'cost', 'crime', 'kids', 'interests',
+                           'season_factors'):
+                self.assertEqual(copy.get_columns()[column].tolist(),
+                                 destinations.get_columns()[column].tolist())
+            self.assertEqual(copy.get_columns()['labels'], destinations.get_columns()['labels'])
+            self.assertFalse(copy.get_interests().flags.writeable)
+            for seed in range(50):
+                profile = random_profile(random.Random(seed))
+                self.assertEqual(recommend_one(copy, profile), recommend_one(destinations, profile))
+
+            # Changes are made to a private copy, leaving the shared block alone
+            copy.apply_delta(removes=[destinations.get_names()[0]])
+            self.assertEqual(len(copy), len(destinations) - 1)
+            self.assertEqual(list(shared.get_destinations().get_names()), destinations.get_names())
+
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                self.assertEqual(executor.submit(_shared_names, shared.get_handle(), [0, 49]).result(),
+                                 [destinations.get_names()[0], destinations.get_names()[49]])
+            del copy
+            attached.close()
+
+    def test_publish_grouped(self):
+        destinations = Destinations()
+        with SharedCatalog.publish(destinations, group_by='continent') as shared:
+            copy = shared.get_destinations()
+            rows = shared.get_original_rows()
+            self.assertEqual(sorted(rows.tolist()), list(range(len(destinations))))
+            self.assertEqual(list(copy.get_names()),
+                             [destinations.get_names()[row] for row in rows])
+            for code in shared.get_groups():
+                start, stop = shared.get_group(code)
+                self.assertTrue((copy.get_continents()[start:stop] == code).all())
+                self.assertTrue((destinations.get_continents()[rows[start:stop]] == code).all())
+                # Each group keeps the catalog's order
+                self.assertEqual(rows[start:stop].tolist(), sorted(rows[start:stop].tolist()))
+            self.assertEqual(sum(stop - start for start, stop in map(shared.get_group, shared.get_groups())),
+                             len(destinations))
+            self.assertEqual(shared.get_group(len(destinations.get_labels('continent'))), (0, 0))
+            del copy, rows
+
+
+class TestCatalogCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = temporary_directory(self)
+        self.filename = os.path.join(self.directory, 'destinations.csv')
+        shutil.copy('destinations.csv', self.filename)
+
+    def assertSameCatalog(self, first, second):
+        first, second = first.get_columns(), second.get_columns()
+        self.assertEqual(first.keys(), second.keys())
+        for key in first:
+            if isinstance(first[key], np.ndarray):
+                np.testing.assert_array_equal(first[key], second[key])
+            else:
+                self.assertEqual(first[key], second[key])
+
+    def test_cache_round_trip(self):
+        parsed = Destinations(self.filename, cache=True)
+        cached = Destinations(self.filename, cache=True)
+        self.assertIsInstance(cached.get_interests(), np.memmap)
+        self.assertSameCatalog(parsed, cached)
+
+    def test_stale_cache(self):
+        Destinations(self.filename, cache=True)
+        with open(self.filename, 'a') as destination_file:
+            destination_file.write('Atlantis,$,low,True,warm,europe,1,1,1,1,5,5,5,5,5,5,5\n')
+        self.assertEqual(len(Destinations(self.filename, cache=True)), 51)
+        self.assertEqual(len(Destinations(self.filename, cache=True)), 51)
+
+
+def random_profile(rng):
+    """(Profile) Return a random validated profile."""
+    return Profile(rng.sample(CONTINENTS, rng.randint(1, len(CONTINENTS))),
+                   rng.choice(COSTS), rng.choice(CRIMES), rng.random() < 0.5,
+                   rng.sample(SEASON_KEYS, rng.randint(1, len(SEASON_KEYS))),
+                   rng.choice(CLIMATES),
+                   [rng.randint(-5, 5) for _ in INTEREST_KEYS])
+
+
+def reference_recommend(destinations, profile):
+    """(str | None) Find the best destination one object at a time, as travel.main used to."""
+    largest = None
+    name = None
+    for destination in destinations.get_all():
+        if destination.get_continent() not in profile.get_continents() \
+                or COSTS.index(destination.get_cost()) > COSTS.index(profile.get_cost()) \
+                or CRIMES.index(destination.get_crime()) > CRIMES.index(profile.get_crime()) \
+                or profile.has_kids() and not destination.is_kid_friendly() \
+                or destination.get_climate() != profile.get_climate():
+            continue
+        interest_score = sum(weight * destination.get_interest_score(key)
+                             for weight, key in zip(profile.get_interests(), INTEREST_KEYS))
+        for season in profile.get_seasons():
+            score = destination.get_season_factor(season) * interest_score
+            if largest is None or score > largest:
+                largest = score
+                name = destination.get_name()
+    return name
+
+
+class DestinationsOf:
+    """Stand-in catalog holding the given Destination objects."""
+    def __init__(self, destinations):
+        self._destinations = destinations
+
+    def get_all(self):
+        return self._destinations
+
+
+class TestRecommender(unittest.TestCase):
+    def setUp(self):
+        self.destinations = Destinations()
+        self.profiles = [random_profile(random.Random(seed)) for seed in range(500)]
+
+    def test_from_answers(self):
+        profile = Profile.from_answers("1, 3,3", "$$", "2", "1", "4,1", "5",
+                                       dict.fromkeys(INTEREST_KEYS, "-2"))
+        self.assertEqual(profile.get_continents(), ('asia', 'north america', 'north america'))
+        self.assertEqual(profile.get_crime(), 'average')
+        self.assertTrue(profile.has_kids())
+        self.assertEqual(profile.get_seasons(), ('winter', 'spring'))
+        self.assertEqual(profile.get_climate(), 'hot')
+        self.assertEqual(profile.get_interests(), (-2,) * len(INTEREST_KEYS))
+
+    def test_recommend_batch(self):
+        expected = [reference_recommend(self.destinations, profile)
+                    for profile in self.profiles]
+        self.assertEqual(recommend_batch(self.destinations, self.profiles), expected)
+
+    def test_recommend_one(self):
+        for profile in self.profiles:
+            self.assertEqual(recommend_one(self.destinations, profile),
+                             reference_recommend(self.destinations, profile))
+
+    def test_recommend_pruned(self):
+        pruned = 0
+        for profile in self.profiles:
+            name, stats = recommend_pruned(self.destinations, profile)
+            self.assertEqual(name, reference_recommend(self.destinations, profile))
+            self.assertLessEqual(stats['destinations'] + stats['pruned_destinations'],
+                                 len(self.destinations))
+            pruned += stats['pruned_destinations']
+        self.assertGreater(pruned, 0)
+
+    def test_recommend_skyline(self):
+        for profile in self.profiles[:100]:
+            front = recommend_skyline(self.destinations, profile)
+            scores = [score for _, _, score in front]
+            self.assertEqual(scores, sorted(scores, reverse=True))
+            best = recommend(self.destinations, profile, k=1)
+            self.assertEqual([score for _, _, score in best], scores[:1])
+
+    def test_recommend_top_k(self):
+        for profile in self.profiles[:100]:
+            ranked = []
+            for destination in self.destinations.get_all():
+                if reference_recommend(DestinationsOf([destination]), profile) is None:
+                    continue
+                interest_score = sum(weight * destination.get_interest_score(key)
+                                     for weight, key in zip(profile.get_interests(), INTEREST_KEYS))
+                season = max(sorted(profile.get_seasons(), key=SEASON_KEYS.index), key=lambda season:
+                             destination.get_season_factor(season) * interest_score)
+                ranked.append((-destination.get_season_factor(season) * interest_score,
+                               destination.get_name(), season))
+            ranked.sort()
+            result = recommend(self.destinations, profile, k=5)
+            self.assertEqual([(destination.get_name(), season, score)
+                              for destination, season, score in result],
+                             [(name, season, -score) for score, name, season in ranked[:5]])
+
+    def test_top_rows_between(self):
+        count = len(self.destinations)
+        for profile in self.profiles[:200]:
+            self.assertEqual(top_rows_between(self.destinations, profile, 0, count, k=5),
+                             top_rows(self.destinations, profile, k=5))
+            rows = [row for row, _, _ in top_rows(self.destinations, profile, k=count)
+                    if 10 <= row < 30][:5]
+            self.assertEqual([row for row, _, _ in
+                              top_rows_between(self.destinations, profile, 10, 30, k=5)], rows)
+
+    def test_parallel_recommend(self):
+        with ParallelRecommender(self.destinations, workers=2, serial_threshold=0) as engine:
+            self.assertTrue(engine.is_parallel())
+            for profile in self.profiles[:50]:
+                self.assertEqual(
+                    [(destination.get_name(), season, score)
+                     for destination, season, score in engine.recommend(profile, k=3)],
+                    [(destination.get_name(), season, score)
+                     for destination, season, score in recommend(self.destinations, profile, k=3)])
+
+    def test_parallel_recommend_after_delta(self):
+        with open('destinations.csv') as destination_file:
+            rows = list(csv.DictReader(destination_file))
+        added = dict(rows[5], name='Atlantis')
+        with ParallelRecommender(self.destinations, workers=2, serial_threshold=0) as engine:
+            engine.recommend(self.profiles[0], k=3)
+            self.destinations.apply_delta(adds=[added], removes=[row['name'] for row in rows[:20]])
+            self.destinations.compact()
+            for profile in self.profiles[:50]:
+                self.assertEqual(
+                    [(destination.get_name(), season, score)
+                     for destination, season, score in engine.recommend(profile, k=3)],
+                    [(destination.get_name(), season, score)
+                     for destination, season, score in recommend(self.destinations, profile, k=3)])
+
+    def test_recommendation_cache(self):
+        now = [0]
+        cache = RecommendationCache(self.destinations, maxsize=2, ttl=10, clock=lambda: now[0])
+        first = Profile.from_answers("1,3,3", "$$$", "3", "2", "1,3", "4", dict.fromkeys(INTEREST_KEYS, "1"))
+        same = Profile.from_answers("3,1", "$$$", "3", "2", "3,1,1", "4", dict.fromkeys(INTEREST_KEYS, "1"))
+        self.assertEqual(first.get_key(), same.get_key())
+        self.assertEqual(cache.recommend_one(first), recommend_one(self.destinations, first))
+        self.assertEqual(cache.recommend_one(same), recommend_one(self.destinations, first))
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+        now[0] = 11
+        cache.recommend_one(first)
+        self.assertEqual(cache.get_stats()['misses'], 2)
+
+        self.destinations.reload()
+        self.assertEqual(cache.get_stats()['size'], 1)
+        cache.recommend_one(first)
+        self.assertEqual(cache.get_stats(), {'hits': 1, 'misses': 3, 'size': 1})
+
+    def test_recommend_stream(self):
+        for profile in self.profiles[:100]:
+            *_, (name, _) = recommend_stream(Destinations.iter_file(chunk_size=7), profile)
+            self.assertEqual(name, reference_recommend(self.destinations, profile))
+
+
+class TestBatch(unittest.TestCase):
+    def test_run_batch(self):
+        records = [ANSWERS, None, dict(ANSWERS, climate="6"), dict(ANSWERS, continent="7")]
+        out_file = io.StringIO()
+        self.assertEqual(run_batch(Destinations(), records, out_file), (2, 2))
+        self.assertEqual([json.loads(line) for line in out_file.getvalue().splitlines()], [
+            {"record": 1, "name": "Dora", "destination": "Macau, China"},
+            {"record": 2, "error": "not a JSON object"},
+            {"record": 3, "error": "invalid climate 6"},
+            {"record": 4, "name": "Dora", "destination": None},
+        ])
+
+    def test_batch_main_unreadable_input(self):
+        directory = temporary_directory(self)
+        results = os.path.join(directory, 'results.jsonl')
+        with open(results, 'w') as results_file:
+            results_file.write('previous results\n')
+        with contextlib.redirect_stderr(io.StringIO()) as error:
+            with self.assertRaises(SystemExit):
+                batch_main(['--batch', os.path.join(directory, 'missing.jsonl'), '--out', results])
+        self.assertIn('cannot read', error.getvalue())
+        # The previous results are left alone
+        with open(results) as results_file:
+            self.assertEqual(results_file.read(), 'previous results\n')
+
+    def test_profile_phases(self):
+        profiler = profiling.enable()
+        try:
+            run_batch(Destinations(), [ANSWERS, dict(ANSWERS, cost="$$$$")], io.StringIO())
+        finally:
+            self.assertIs(profiling.disable(), profiler)
+        phases = profiler.get_phases()
+        self.assertEqual(list(phases), ['load', 'validation', 'filter', 'score', 'output'])
+        self.assertEqual(phases['validation']['calls'], 2)
+        self.assertEqual(phases['output']['calls'], 2)
+        self.assertEqual(json.loads(profiler.to_json())['phases'], phases)
+
+        # Nothing is recorded while timing is off
+        run_batch(Destinations(), [ANSWERS], io.StringIO())
+        self.assertEqual(profiler.get_phases(), phases)
+
+
+class TestQuestionnaire(unittest.TestCase):
+    def test_is_valid(self):
+        for answer in ["1", "7", "1,2,2,3", "1, 3,   4,5", " 3", "03", "+2"]:
+            self.assertTrue(QUESTIONS["continent"].is_valid(answer), answer)
+        for answer in ["", "0", "8", "1,,2", "3.0", "one", "1;2"]:
+            self.assertFalse(QUESTIONS["continent"].is_valid(answer), answer)
+        self.assertTrue(QUESTIONS["cost"].is_valid("$$"))
+        self.assertFalse(QUESTIONS["cost"].is_valid(" $"))
+        self.assertTrue(QUESTIONS["beach"].is_valid("-5"))
+        self.assertFalse(QUESTIONS["beach"].is_valid("+5"))
+
+    def test_validate_many(self):
+        records = [ANSWERS, dict(ANSWERS, season="5"), dict(ANSWERS, nature="6", cost="$$$$"),
+                   {key: value for key, value in ANSWERS.items() if key != "name"}]
+        self.assertEqual(list(validate_many(records)),
+                         [None, "invalid season 5", "invalid cost $$$$", "missing answer to name"])
+        self.assertEqual(validate(dict(ANSWERS, beach=5)), "invalid beach 5 (int, expected a string)")
+        self.assertEqual(validate(from_json(dict(ANSWERS, crime=2, beach=-5))), None)
+        self.assertEqual(validate(from_json(dict(ANSWERS, beach=True))),
+                         "invalid beach True (bool, expected a string)")
+
+
+class TestService(unittest.TestCase):
+    def test_handle(self):
+        service = RecommendationService(Destinations())
+        answers = {key: value for key, value in ANSWERS.items() if key != "name"}
+        self.assertEqual(service.handle('POST', '/recommend', json.dumps(answers).encode()),
+                         (200, {'destination': 'Macau, China'}))
+        self.assertEqual(service.handle('POST', '/recommend', b'{"cost": "$"}')[0], 400)
+        self.assertEqual(service.handle('GET', '/recommend', b'')[0], 405)
+        status, health = service.handle('GET', '/health', b'')
+        self.assertEqual(health['destinations'], 50)
+        self.assertEqual(health['cache'], {'hits': 0, 'misses': 1, 'size': 1})
+
+    def test_bad_content_length(self):
+        service = RecommendationService(Destinations())
+
+        async def status_line(request):
+            server = await asyncio.start_server(service.serve_connection, '127.0.0.1', 0)
+            async with server:
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', server.sockets[0].getsockname()[1])
+                writer.write(request)
+                line = await reader.readline()
+                writer.close()
+                return line
+
+        for length in ('-5', 'five'):
+            request = 'POST /recommend HTTP/1.1\r\nContent-Length: {}\r\n\r\n{{}}'.format(length)
+            self.assertEqual(asyncio.run(status_line(request.encode())),
+                             b'HTTP/1.1 400 Bad Request\r\n')
+
+
+@unittest.skipUnless(warm.is_supported(), "needs Unix sockets")
+class TestWarmServer(unittest.TestCase):
+    def test_recommend(self):
+        directory = temporary_directory(self)
+        path = os.path.join(directory, 'warm.sock')
+        server = threading.Thread(target=warm.serve, args=('destinations.csv', path, 30))
+        server.start()
+        try:
+            for _ in range(500):
+                try:
+                    reply = warm._exchange(path, {'command': 'ping'})
+                    break
+                except OSError:
+                    server.join(0.01)
+            self.assertEqual(reply, {'destinations': 50})
+
+            self.assertEqual(warm._exchange(path, {'answers': ANSWERS}),
+                             {'destination': 'Macau, China'})
+            self.assertEqual(warm._exchange(path, {'answers': dict(ANSWERS, cost="$$$$")}),
+                             {'error': 'invalid cost $$$$'})
+        finally:
+            warm._exchange(path, {'command': 'stop'})
+            server.join()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(warm.stop(os.path.join(directory, 'missing.csv')))
+
+
+    def test_private_sockets(self):
+        directory = temporary_directory(self)
+        shared = os.path.join(directory, 'shared')
+        os.mkdir(shared, 0o755)
+        os.chmod(shared, 0o755)
+        with unittest.mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': shared}):
+            with self.assertRaises(PermissionError):
+                warm.socket_path('destinations.csv')
+        with unittest.mock.patch.dict(os.environ, {'XDG_RUNTIME_DIR': directory}):
+            self.assertEqual(os.path.dirname(warm.socket_path('destinations.csv')), directory)
+
+        # A socket others may write to is not trusted
+        path = os.path.join(directory, 'warm.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+            listener.bind(path)
+            listener.listen()
+            os.chmod(path, 0o666)
+            with self.assertRaises(PermissionError):
+                warm._exchange(path, {'command': 'ping'})
+
+if __name__ == '__main__':
+    unittest.main()
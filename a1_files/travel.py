@@ -6,442 +6,265 @@ __author__ = "Changxin Liu    45245008"
 __date__ = "27/03/2019"
 
 
-from destinations import Destinations
+import argparse
+import csv
+import json
+import sys
+import time
 
-def continent_validation(continent):
-    """ Decide if the continent inputs are valid then return valid continent inputs.
+import profiling
+import warm as warm_server
+from profiling import phase, timed
+from questionnaire import ANSWER_KEYS, INTEREST_ANSWER_KEYS, QUESTIONS, from_json, validate
 
-        Parameters:
-            continent(str): A user's inputs to the continent question.
-                            For example, "1,3,4,7" is a valid input. "1,2,2,3" is a valid input and "1, 3,   4,5" is also a valid input.
+# destinations and recommender import NumPy, which takes longer than a whole
+# run answered by the warm server, so they are imported where they are used
 
-        Return:
-            (str): Valid strings without commas or spaces or characters.
-                                                
-    """
+# Number of valid records scored together by recommend_batch
+BATCH_SIZE = 4096
 
-
-    def is_valid_digit(continent):
-        """ Decide the condition that controls the while loop.
-
-            Parameters:
-                continent(str): A user's inputs to the continent question.
-
-            Return:
-                (bool): Decide which type the invalidation is.
-        """
-        continent_input_list = continent.split(",")
-        for a in continent_input_list :
-            try:
-                int_a = int(a)
-            except:
-                return True
-            else:
-                if int_a != 1 and int_a != 2 and int_a != 3 and int_a != 4 and int_a != 5 and int_a != 6 and int_a != 7:
-                    return True
-                else :
-                    continue
-    while is_valid_digit(continent) : 
-        print("\nI'm sorry, but " + continent + " is not a valid choice. Please try again.\n")
-        continent = input("Which continents would you like to travel to?"
-                  + "\n  1) Asia"
-                  + "\n  2) Africa"
-                  + "\n  3) North America"
-                  + "\n  4) South America"
-                  + "\n  5) Europe"
-                  + "\n  6) Oceania"
-                  + "\n  7) Antarctica"
-                  + "\n> ")
-        
-    return continent            
-    
-
-def cost_validation(money):
-    """ Decide if the money input is valid.
+@timed("validation")
+def ask_until_valid(key, answer):
+    """ Decide if an answer is valid, asking the question again until it is.
 
         Parameters:
-            money(str): A user's input to the cost question.
+            key(str): The question's key in QUESTIONS, such as "continent".
+            answer(str): A user's input to the question.
+                         For example, "1,3,4,7" and "1, 3,   4,5" are valid inputs to the continent question.
 
         Return:
-            (str): A single valid string, such as "$" or "$$" or "$$$".
+            (str): The first valid answer.
     """
-    while money != "$$$" and money != "$$" and money != "$" :
-         print("\nI'm sorry, but " + money + " is not a valid choice. Please try again.")
-         money = input("\nWhat is money to you?"
-              + "\n  $$$) No object"
-              + "\n  $$) Spendable, so long as I get value from doing so"
-              + "\n  $) Extremely important; I want to spend as little as possible"
-              + "\n> ")
-    return money
-
-def crime_validation(crime):
-    """ Decide if crime input is valid.
+    question = QUESTIONS[key]
+    while not question.is_valid(answer) :
+        print(question.get_retry_message(answer))
+        answer = input(question.get_prompt())
+    return answer
 
-        Parameters:
-            crime(str): A user's input to the crime level.
-
-        Return:
-            (str): A single valid string, such as "1", "2" or "3".
-    """
-    while crime != "1" and crime != "2" and crime != "3" :
-        print("\nI'm sorry, but " + crime + " is not a valid choice. Please try again.")
-        crime = input("\nHow much crime is acceptable when you travel?"
-              + "\n  1) Low"
-              + "\n  2) Average"
-              + "\n  3) High"
-              + "\n> ")
-    return crime
-
-def kid_friendly_validation(children):
-    """ Decide if kid_friendly input valid.
+def ask(key):
+    """ Ask a question until it is answered validly.
 
         Parameters:
-            children(str): A user's input to the kid-friendly choice.
+            key(str): The question's key in QUESTIONS, such as "cost".
 
         Return:
-            (str): A single valid string, such as "1" or "2".
+            (str): The user's valid answer.
     """
-    while children != "1" and children != "2" :
-        print("\nI'm sorry, but " + children + " is not a valid choice. Please try again.")
-        children = input("\nWill you be travelling with children?"
-                 + "\n  1) Yes"
-                 + "\n  2) No"
-                 + "\n> ")
-    return children
+    return ask_until_valid(key, input(QUESTIONS[key].get_prompt()))
+
+def recommend_answers(answers, warm=False):
+    """ Decide the destination to recommend for a valid set of answers.
 
-def season_validation(season):
-    """ Decide if the season inputs are valid then return valid inputs.
+        With warm, the answers are sent to the warm server for destinations.csv.
+        If it is not running, it is started for the next run and the answers
+        are scored here.
 
         Parameters:
-            season(str): A user's inputs to the season factor.
+            answers(dict<str, str>): The user's answers, keyed by ANSWER_KEYS.
+            warm(bool): If True, use the warm server.
 
         Return:
-            (str): Valid strings without commas or spaces or characters.
+            (str | None): The name of the destination, or None if none is suitable.
     """
-    def is_valid_digit(season):
-        """ Decide the condition that controls the while loop.
-
-            Parameters:
-                continent(str): A user's inputs to the season question.
-
-            Return:
-                (bool): Decide which type the invalidation is.
-        """
-        season_input_list = season.split(",")
-        for a in season_input_list :
-            try:
-                int_a = int(a)
-            except:
-                return True
-            else:
-                if int_a != 1 and int_a != 2 and int_a != 3 and int_a != 4 :
-                    return True
-                else :
-                    continue
-    while is_valid_digit(season) : 
-        print("\nI'm sorry, but " + season + " is not a valid choice. Please try again.\n")
-        season = input("\nWhich seasons do you plan to travel in?"
-               + "\n  1) Spring"
-               + "\n  2) Summer"
-               + "\n  3) Autumn"
-               + "\n  4) Winter"
-               + "\n> ")
-    return season
-            
-def climate_validation(climate):
-    """ Decide if the climate input is valid.
+    if warm and warm_server.is_supported() :
+        try:
+            return warm_server.recommend(answers)
+        except OSError:
+            warm_server.start()
+        except ValueError:
+            pass
+
+    from destinations import Destinations
+    from recommender import Profile, recommend_one
+    profile = Profile.from_answers(answers["continent"], answers["cost"], answers["crime"],
+                                   answers["children"], answers["season"], answers["climate"],
+                                   {key: answers[key] for key in INTEREST_ANSWER_KEYS})
+    return recommend_one(Destinations(), profile)
 
-        Parameters:
-            (str): A user's input to the climate input.
+def main():
+    run_questionnaire()
 
-        Return:
-            (str): A single valid string, such as "cold", "cool" or " Moderate" and so on.
-    """
-    while climate != "1" and climate != "2" and climate != "3" and climate != "4" and climate != "5" :
-        print("\nI'm sorry, but " + climate + " is not a valid choice. Please try again.")
-        climate = input("\nWhat climate do you prefer?"
-                + "\n  1) Cold"
-                + "\n  2) Cool"
-                + "\n  3) Moderate"
-                + "\n  4) Warm"
-                + "\n  5) Hot"
-                + "\n> ")
-    return climate
-
-def sports_validation(sports):
-    """ Decide if the sport input is valid.
+def run_questionnaire(warm=False):
+    """ Ask the questionnaire and print the recommended destination.
 
         Parameters:
-            sports(str): A user's input to the sport factor.
-
-        Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
+            warm(bool): If True, recommend with the warm server, see recommend_answers.
     """
+    # Task 1: Ask questions here
+
+    # Welcome Information 
+    print("Welcome to Travel Inspiration!\n")
 
-    while sports != "5" and sports != "4" and sports != "3" and sports != "2" and sports != "1" and sports != "0" and sports != "-1" and sports != "-2" and sports != "-3" and sports != "-4" and sports != "-5" :
-        print("\nI'm sorry, but " + sports + " is not a valid choice. Please try again.")
-        sports = input("\nHow much do you like sports? (-5 to 5)"
-                   + "\n> ")
-    return sports
+    # Prompt the user to input the name 
+    user_name = input("What is your name? ")
+    print("\nHi,", user_name + "!\n")
 
-def wildlife_validation(wildlife):
-    """ Decide if the wildlife input is valid.
+    # Get the user's continents, cost, crime, children, seasons and climate
+    answers = {"name": user_name}
+    for key in ["continent", "cost", "crime", "children", "season", "climate"] :
+        answers[key] = ask(key)
 
-        Parameters:
-            wildlife(str): A user's input to the wildlife factor.
+    # Introduction of the interst questionnair 
+    print("\nNow we would like to ask you some questions about your interests, on a scale of -5 to 5. -5 indicates strong dislike, whereas 5 indicates strong interest, and 0 indicates indifference.") 
 
-        Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
-    """
-    while wildlife != "5" and wildlife != "4" and wildlife != "3" and wildlife != "2" and wildlife != "1" and wildlife != "0" and wildlife != "-1" and wildlife != "-2" and wildlife != "-3" and wildlife != "-4" and wildlife != "-5" :
-        print("\nI'm sorry, but " + wildlife + " is not a valid choice. Please try again.")
-        wildlife = input("\nHow much do you like wildlife? (-5 to 5)"
-                     + "\n> ")
-    return wildlife
+    # Get user's interest score 
+    for key in INTEREST_ANSWER_KEYS :
+        answers[key] = ask(key)
 
-def nature_validation(nature):
-    """ Decide if the nature input is valid.
+    # Ending statement
+    print("\nThank you for answering all our questions. Your next travel destination is:" )
 
-        Parameters:
-            (str): A user's input to the nature factor.
+    # Score the destinations the answers allow
+    destination_name = recommend_answers(answers, warm)
 
-        Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
-    """
-    while nature != "5" and nature != "4" and nature != "3" and nature != "2" and nature != "1" and nature != "0" and nature != "-1" and nature != "-2" and nature != "-3" and nature != "-4" and nature != "-5" :
-        print("\nI'm sorry, but " + nature + " is not a valid choice. Please try again.")           
-        nature = input("\nHow much do you like nature? (-5 to 5)"
-                   + "\n> ")
-    return nature
+    # Task 2+: Output final answer here
+    with phase("output"):
+        if destination_name is not None :
+            print(destination_name)
+        else :
+            print("None")
 
-def historical_site_validation(historical_sites):
-    """ Decide if the historical site input is valid.
+def read_records(answers_file, filename):
+    """ Read the batch records one at a time.
 
         Parameters:
-            (str): A user's input to the historical site factor.
+            answers_file(file): The opened answers file.
+            filename(str): Its name; ".csv" files are read as csv, anything else as JSON lines.
 
         Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
+            (iter<dict>): The records, with None in place of lines that are not JSON objects.
+                          Whole numbers in JSON records are read as strings, see from_json.
     """
-    while historical_sites != "5" and historical_sites != "4" and historical_sites != "3" and historical_sites != "2" and historical_sites != "1" and historical_sites != "0" and historical_sites != "-1" and historical_sites != "-2" and historical_sites != "-3" and historical_sites != "-4" and historical_sites != "-5" :
-        print("\nI'm sorry, but " + historical_sites + " is not a valid choice. Please try again.")           
-        historical_sites = input("\nHow much do you like historical sites? (-5 to 5)"
-                             + "\n> ")
-    return historical_sites
-
-def fine_dining_validation(fine_dining):
-    """ Decide if the cuisine input is valid.
+    if filename.endswith(".csv") :
+        yield from csv.DictReader(answers_file)
+        return
+    for line in answers_file :
+        if line.strip() == "" :
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield from_json(record) if isinstance(record, dict) else None
+
+def run_batch(destinations, records, out_file):
+    """ Recommend a destination for every record and write one JSON line per record.
+
+        Valid records are scored BATCH_SIZE at a time with recommend_batch and
+        the results are written as soon as each batch is scored.
 
         Parameters:
-            (str): A user's input to the cuisine factor.
-        
+            destinations(Destinations): The catalog to recommend from.
+            records(iter<dict>): The users' answers, keyed by ANSWER_KEYS.
+            out_file(file): Where the results are written.
+
         Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
+            (tuple<int, int>): The number of valid and invalid records.
     """
-    while fine_dining != "5" and fine_dining != "4" and fine_dining != "3" and fine_dining != "2" and fine_dining != "1" and fine_dining != "0" and fine_dining != "-1" and fine_dining != "-2" and fine_dining != "-3" and fine_dining != "-4" and fine_dining != "-5" :
-        print("\nI'm sorry, but " + fine_dining + " is not a valid choice. Please try again.")           
-        fine_dining = input("\nHow much do you like fine dining? (-5 to 5)"
-                        + "\n> ")
-    return fine_dining
-
-def adventure_activity_validation(adventure_activities):
-    """ Decide if the adventure activity input is valid.
+    from recommender import Profile, recommend_batch
+
+    valid = 0
+    invalid = 0
+    pending = []
+
+    def flush():
+        if not pending :
+            return
+        names = recommend_batch(destinations, [profile for _, _, profile in pending])
+        with phase("output"):
+            for (number, user_name, _), destination_name in zip(pending, names) :
+                out_file.write(json.dumps({"record": number, "name": user_name,
+                                           "destination": destination_name}) + "\n")
+        pending.clear()
+
+    for number, record in enumerate(records, 1) :
+        error = "not a JSON object" if record is None else validate(record)
+        if error is not None :
+            # Keep the output in input order
+            flush()
+            with phase("output"):
+                out_file.write(json.dumps({"record": number, "error": error}) + "\n")
+            invalid += 1
+            continue
+        profile = Profile.from_answers(record["continent"], record["cost"], record["crime"],
+                                       record["children"], record["season"], record["climate"],
+                                       {key: record[key] for key in INTEREST_ANSWER_KEYS})
+        pending.append((number, record["name"], profile))
+        valid += 1
+        if len(pending) == BATCH_SIZE :
+            flush()
+    flush()
+    return valid, invalid
+
+def batch_main(args):
+    """ Answer a whole file of questionnaires without prompting.
 
         Parameters:
-            (str): A user's input to the adventure activity factor.
-
-        Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
+            args(list<str>): The command line arguments.
     """
-    while adventure_activities != "5" and adventure_activities != "4" and adventure_activities != "3" and adventure_activities != "2" and adventure_activities != "1" and adventure_activities != "0" and adventure_activities != "-1" and adventure_activities != "-2" and adventure_activities != "-3" and adventure_activities != "-4" and adventure_activities != "-5" :
-        print("\nI'm sorry, but " + adventure_activities + " is not a valid choice. Please try again.")           
-        adventure_activities = input("\nHow much do you like adventure activities? (-5 to 5)"
-                                 + "\n> ")
-    return adventure_activities
-
-def beach_validation(beach):
-    """ Decide if the beach input is valid.
+    parser = argparse.ArgumentParser(description="Recommend destinations for a file of questionnaire answers.")
+    parser.add_argument("--batch", required=True, metavar="ANSWERS",
+                        help="JSON lines or .csv file of answers, keyed by " + ", ".join(ANSWER_KEYS))
+    parser.add_argument("--out", default="-", metavar="RESULTS",
+                        help="JSON lines file to write the results to (default: standard output)")
+    parser.add_argument("--destinations", default="destinations.csv",
+                        help="destination database (default: destinations.csv)")
+    options = parser.parse_args(args)
+
+    from destinations import Destinations
+    start = time.perf_counter()
+    # The results file is only opened, and emptied, once everything read can be
+    try:
+        answers_file = open(options.batch, newline="")
+    except OSError as error:
+        parser.error("cannot read {}: {}".format(options.batch, error.strerror))
+    with answers_file:
+        try:
+            destinations = Destinations(options.destinations, cache=True)
+        except OSError as error:
+            parser.error("cannot read {}: {}".format(options.destinations, error.strerror))
+        try:
+            out_file = sys.stdout if options.out == "-" else open(options.out, "w")
+        except OSError as error:
+            parser.error("cannot write {}: {}".format(options.out, error.strerror))
+        try:
+            valid, invalid = run_batch(destinations, read_records(answers_file, options.batch), out_file)
+        finally:
+            if out_file is not sys.stdout :
+                out_file.close()
+    elapsed = time.perf_counter() - start
+
+    total = valid + invalid
+    print("Processed {} records ({} valid, {} invalid) in {:.3f}s: {:.0f} records/sec".format(
+        total, valid, invalid, elapsed, total / elapsed if elapsed > 0 else 0), file=sys.stderr)
+
+def run(args):
+    """ Run the questionnaire, or a batch if there are batch arguments.
+
+        With --profile, the time spent in each phase is written to standard
+        error as JSON when the run ends, leaving the normal output unchanged.
+        With --warm, the questionnaire is answered by the warm server, see
+        recommend_answers.
 
         Parameters:
-            (str): A user's input to the beach factor.
-
-        Return:
-            (str): A single valid string, such as "1", "0" or "-5" and so on.
+            args(list<str>): The command line arguments.
     """
-    while beach != "5" and beach != "4" and beach != "3" and beach != "2" and beach != "1" and beach != "0" and beach != "-1" and beach != "-2" and beach != "-3" and beach != "-4" and beach != "-5" :
-        print("\nI'm sorry, but " + beach + " is not a valid choice. Please try again.")           
-        beach = input("\nHow much do you like the beach? (-5 to 5)"
-                  + "\n> ")
-    return beach
-        
-def main():
-    # Task 1: Ask questions here
-
-    # Welcome Information 
-    print("Welcome to Travel Inspiration!\n")
-
-    # Prompt the user to input the name 
-    user_name = input("What is your name? ")
-    print("\nHi,", user_name + "!\n")
-    
-    # Get the user's preferred continents
-    continent = input("Which continents would you like to travel to?"
-                  + "\n  1) Asia"
-                  + "\n  2) Africa"
-                  + "\n  3) North America"
-                  + "\n  4) South America"
-                  + "\n  5) Europe"
-                  + "\n  6) Oceania"
-                  + "\n  7) Antarctica"
-                  + "\n> ")
-    continent_list = ["", "asia", "africa", "north america", "south america", "europe", "oceania", "antarctica"]
-    valid_continent_input = continent_validation(continent)
-    continent_input_list = valid_continent_input.split(",")
-    
-
-    # Get the user's response to travel cost
-    money = input("\nWhat is money to you?"
-              + "\n  $$$) No object"
-              + "\n  $$) Spendable, so long as I get value from doing so"
-              + "\n  $) Extremely important; I want to spend as little as possible"
-              + "\n> ")
-    valid_cost_input = cost_validation(money)
-    
-
-
-    # Get the user's attitude towards crime issues 
-    crime = input("\nHow much crime is acceptable when you travel?"
-              + "\n  1) Low"
-              + "\n  2) Average"
-              + "\n  3) High"
-              + "\n> ")
-    crime_list = ["", "low", "average", "high"]
-    valid_crime_input = crime_validation(crime)
-    
-
-
-    # Determine if the user will go travelling with children 
-    children = input("\nWill you be travelling with children?"
-                 + "\n  1) Yes"
-                 + "\n  2) No"
-                 + "\n> ")
-    valid_kid_friendly_input = kid_friendly_validation(children)
-    if valid_kid_friendly_input == "1" :
-        chi = True
-    elif valid_kid_friendly_input == "2" :
-        chi = False
-
-
-
-    # Get the user's attitude towards different seasons 
-    season = input("\nWhich seasons do you plan to travel in?"
-               + "\n  1) Spring"
-               + "\n  2) Summer"
-               + "\n  3) Autumn"
-               + "\n  4) Winter"
-               + "\n> ")
-    
-    valid_season_input = season_validation(season)
-    season_input_list = valid_season_input.split(",")
-    season_list = ["", "spring", "summer", "autumn", "winter"]
-
-
-    # Get the user's attitude towards different climates 
-    climate = input("\nWhat climate do you prefer?"
-                + "\n  1) Cold"
-                + "\n  2) Cool"
-                + "\n  3) Moderate"
-                + "\n  4) Warm"
-                + "\n  5) Hot"
-                + "\n> ")
-    valid_climate_input = climate_validation(climate)
-    if valid_climate_input == "1" :
-        cli = "cold"
-    elif valid_climate_input == "2" :
-        cli = "cool"
-    elif valid_climate_input == "3" :
-        cli = "moderate"
-    elif valid_climate_input == "4" :
-        cli = "warm"
-    elif valid_climate_input == "5" :
-        cli = "hot"
-
-
-
-    # Introduction of the interst questionnair 
-    print("\nNow we would like to ask you some questions about your interests, on a scale of -5 to 5. -5 indicates strong dislike, whereas 5 indicates strong interest, and 0 indicates indifference.") 
-
-
-
-    # Get user's interest score 
-    sports = input("\nHow much do you like sports? (-5 to 5)"
-                   + "\n> ")
-    valid_sports_input = sports_validation(sports)
-    wildlife = input("\nHow much do you like wildlife? (-5 to 5)"
-                     + "\n> ")
-    valid_wildlife_input = wildlife_validation(wildlife)
-    nature = input("\nHow much do you like nature? (-5 to 5)"
-                   + "\n> ")
-    valid_nature_input = nature_validation(nature)
-    historical_sites = input("\nHow much do you like historical sites? (-5 to 5)"
-                             + "\n> ")
-    valid_historical_site_input = historical_site_validation(historical_sites)
-    fine_dining = input("\nHow much do you like fine dining? (-5 to 5)"
-                        + "\n> ")
-    valid_fine_dining_input = fine_dining_validation(fine_dining)
-    adventure_activities = input("\nHow much do you like adventure activities? (-5 to 5)"
-                                 + "\n> ")
-    valid_adventure_activity_input = adventure_activity_validation(adventure_activities)
-    beach = input("\nHow much do you like the beach? (-5 to 5)"
-                  + "\n> ")
-    valid_beach_input = beach_validation(beach)
-
-
-
-    # Ending statement
-    print("\nThank you for answering all our questions. Your next travel destination is:" )
-
-    # Some variables which are going to be used in the comparison later
-    largest = -999999
-    destination_name = ""
-    destination_list = []
-
-
-
-    for destination in Destinations().get_all():
-        # Task 2+: Add comparison logic here
-        for continents in continent_input_list :
-            int_continents = int(continents)
-            temp_continents = continent_list[int_continents]
-            for seasons in season_input_list:
-                int_seasons = int(seasons)
-                temp_seasons = season_list[int_seasons]
-                # Decide the continent, cost, crime, kid-friendly and climate factor
-                if temp_continents == destination.get_continent() and\
-                    valid_cost_input >= destination.get_cost() and\
-                    int(valid_crime_input) >= crime_list.index(destination.get_crime()) and\
-                    chi <= bool(destination.is_kid_friendly()) and \
-                    cli == destination.get_climate() :
-                    # Calculate the total score
-                    interest_score = int(valid_sports_input) * destination.get_interest_score("sports") \
-                        + int(valid_wildlife_input) * destination.get_interest_score("wildlife") \
-                        + int(valid_nature_input) * destination.get_interest_score("nature") \
-                        + int(valid_historical_site_input) * destination.get_interest_score("historical") \
-                        + int(valid_fine_dining_input) * destination.get_interest_score("cuisine") \
-                        + int(valid_adventure_activity_input) * destination.get_interest_score("adventure") \
-                        + int(valid_beach_input) * destination.get_interest_score("beach")
-                    score = destination.get_season_factor(temp_seasons) * interest_score    
-                    # compare the score and decide the final destination
-                    if score > largest :
-                        largest = score
-                        destination_name = destination.get_name()
-                        destination_list.append(destination_name)
-
-    # Task 2+: Output final answer here
-    if destination_list != [] :
-        print(destination_name)
-    else :
-        print("None")
+    profile = "--profile" in args
+    if profile :
+        args = [arg for arg in args if arg != "--profile"]
+        profiler = profiling.enable()
+    warm = "--warm" in args
+    if warm :
+        args = [arg for arg in args if arg != "--warm"]
+    try:
+        if args :
+            batch_main(args)
+        else :
+            run_questionnaire(warm)
+    finally:
+        if profile :
+            profiling.disable()
+            print(profiler.to_json(), file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
+    run(sys.argv[1:])
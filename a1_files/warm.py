@@ -0,0 +1,284 @@
+"""
+Warm recommendation server for repeated runs of travel.py.
+
+The first "travel.py --warm" starts this module in the background, where
+it keeps the destination database loaded. Later runs send their answers
+to it over a local Unix socket instead of importing NumPy and loading the
+database themselves. Each database file has its own server, which exits
+after IDLE_TIMEOUT seconds without a request, or when asked to stop:
+
+    python warm.py --stop --destinations destinations.csv
+
+The sockets are kept in $XDG_RUNTIME_DIR, or else in a directory of the
+system's temporary directory that only this user may use, and a socket
+is only trusted if this user owns it, so that no other user can answer
+in its place.
+
+This module does not import NumPy until it serves, so that the client
+side stays quick to start.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+
+
+# Seconds a server waits for a request before exiting
+IDLE_TIMEOUT = 600
+
+# Seconds a client or server waits on one connection
+CONNECTION_TIMEOUT = 5
+
+# Largest request or reply, in bytes
+MAX_MESSAGE = 65536
+
+
+def is_supported():
+    """(bool) Return if this platform has the Unix sockets the server listens on."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+def _user():
+    """(int) Return this process's user id."""
+    return os.getuid() if hasattr(os, 'getuid') else 0
+
+
+def _check_private(path, kind):
+    """Check that a path is of the kind and belongs to this user alone.
+
+    Parameters:
+        path (str): The directory or socket to check.
+        kind (function): stat.S_ISDIR or stat.S_ISSOCK.
+
+    Raises:
+        PermissionError: If it is not of the kind, is owned by another user,
+            or others may use it.
+    """
+    status = os.lstat(path)
+    if not kind(status.st_mode) or status.st_uid != _user() or status.st_mode & 0o077:
+        raise PermissionError("{} is not private to this user".format(path))
+
+
+def socket_directory():
+    """(str) Return the directory of this user's sockets, creating it if needed.
+
+    Raises:
+        PermissionError: If the directory may be used by other users.
+    """
+    directory = os.environ.get('XDG_RUNTIME_DIR')
+    if not directory:
+        directory = os.path.join(tempfile.gettempdir(), 'travel-{}'.format(_user()))
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+    _check_private(directory, stat.S_ISDIR)
+    return directory
+
+
+def socket_path(filename):
+    """(str) Return the socket of the server for a database file.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+
+    Raises:
+        PermissionError: If the socket directory may be used by other users.
+    """
+    digest = hashlib.sha1(os.path.abspath(filename).encode()).hexdigest()[:16]
+    return os.path.join(socket_directory(), 'travel-{}.sock'.format(digest))
+
+
+def _exchange(path, message, timeout=CONNECTION_TIMEOUT):
+    """(dict) Send one JSON message to a server and return its JSON reply.
+
+    Raises:
+        OSError: If no server is listening on the path or it does not reply.
+        PermissionError: If the socket is not this user's alone.
+    """
+    _check_private(path, stat.S_ISSOCK)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(path)
+        client.sendall(json.dumps(message).encode() + b'\n')
+        reply = _read_line(client)
+    if reply is None:
+        raise ConnectionError("The warm server closed the connection without replying")
+    return json.loads(reply)
+
+
+def _read_line(connection):
+    """(bytes) Return one newline terminated message from a connection,
+    or None if it closes first.
+    """
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = connection.recv(4096)
+        if not chunk:
+            return None
+        data += chunk
+        if len(data) > MAX_MESSAGE:
+            raise ValueError("Message too large")
+    return data
+
+
+def recommend(answers, filename='destinations.csv'):
+    """(str | None) Return the warm server's recommendation for a set of answers.
+
+    Parameters:
+        answers (dict<str, str>): Valid answers, keyed by questionnaire.ANSWER_KEYS.
+        filename (str): Name of file containing destination data.
+
+    Raises:
+        OSError: If no server for the file is running.
+        ValueError: If the server rejects the answers.
+    """
+    reply = _exchange(socket_path(filename), {'answers': answers})
+    if 'error' in reply:
+        raise ValueError(reply['error'])
+    return reply['destination']
+
+
+def start(filename='destinations.csv'):
+    """Start a server for the database file in the background, without waiting for it.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+    """
+    subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                      '--destinations', os.path.abspath(filename)],
+                     cwd=os.path.dirname(os.path.abspath(__file__)),
+                     stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, start_new_session=True)
+
+
+def stop(filename='destinations.csv'):
+    """(bool) Ask the server for the database file to exit, returning if one was running.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+    """
+    try:
+        _exchange(socket_path(filename), {'command': 'stop'})
+    except OSError:
+        return False
+    return True
+
+
+def _stamp(filename):
+    """(tuple) Return what changes when the database file is replaced or edited."""
+    status = os.stat(filename)
+    return status.st_mtime_ns, status.st_size, status.st_ino
+
+
+def serve(filename, path=None, idle_timeout=IDLE_TIMEOUT):
+    """Answer recommendation requests for a database file until idle or stopped.
+
+    Requests are handled one at a time. The database is loaded again when
+    the file changes.
+
+    Parameters:
+        filename (str): Name of file containing destination data.
+        path (str): Socket to listen on, by default socket_path(filename).
+        idle_timeout (float): Seconds without a request before exiting.
+    """
+    from destinations import Destinations
+    from questionnaire import INTEREST_ANSWER_KEYS, validate
+    from recommender import Profile, recommend_one
+
+    path = path or socket_path(filename)
+    # Only listen where no other user can replace the socket
+    _check_private(os.path.dirname(os.path.abspath(path)), stat.S_ISDIR)
+    try:
+        _exchange(path, {'command': 'ping'}, timeout=1)
+        # Another server already answers on this socket
+        return
+    except (OSError, ValueError):
+        pass
+
+    destinations = Destinations(filename, cache=True)
+    destinations.get_index()
+    stamp = _stamp(filename)
+
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        # Only this user may send requests
+        previous_umask = os.umask(0o177)
+        try:
+            server.bind(path)
+        finally:
+            os.umask(previous_umask)
+        server.listen()
+        server.settimeout(idle_timeout)
+
+        while True:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                return
+            with connection:
+                connection.settimeout(CONNECTION_TIMEOUT)
+                try:
+                    request = json.loads(_read_line(connection) or b'null')
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(request, dict):
+                    reply = {'error': 'request is not a JSON object'}
+                elif request.get('command') == 'stop':
+                    connection.sendall(b'{"stopping": true}\n')
+                    return
+                elif request.get('command') == 'ping':
+                    reply = {'destinations': len(destinations)}
+                else:
+                    answers = request.get('answers')
+                    error = validate(answers) if isinstance(answers, dict) \
+                        else 'answers are not a JSON object'
+                    if error is not None:
+                        reply = {'error': error}
+                    else:
+                        if _stamp(filename) != stamp:
+                            destinations.reload()
+                            stamp = _stamp(filename)
+                        profile = Profile.from_answers(
+                            answers['continent'], answers['cost'], answers['crime'],
+                            answers['children'], answers['season'], answers['climate'],
+                            {key: answers[key] for key in INTEREST_ANSWER_KEYS})
+                        reply = {'destination': recommend_one(destinations, profile)}
+                try:
+                    connection.sendall(json.dumps(reply).encode() + b'\n')
+                except OSError:
+                    pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+def main():
+    """Run or stop the warm server for a database file."""
+    parser = argparse.ArgumentParser(description="Keep the destination database loaded for travel.py --warm.")
+    parser.add_argument('--destinations', default='destinations.csv',
+                        help="destination database (default: destinations.csv)")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument('--serve', action='store_true', help="run the server in this process")
+    action.add_argument('--stop', action='store_true', help="stop the running server")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help="seconds without a request before the server exits")
+    options = parser.parse_args()
+
+    if options.stop:
+        print("Stopped" if stop(options.destinations) else "No server was running")
+    else:
+        serve(options.destinations, idle_timeout=options.idle_timeout)
+
+
+if __name__ == "__main__":
+    main()